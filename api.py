@@ -0,0 +1,241 @@
+"""JSON inference API for the code assistant, served by `main.py --mode api`.
+
+Model and sandbox calls run on a thread pool sized to the sum of the
+per-endpoint concurrency limits, so the event loop never blocks and no
+request waits invisibly inside the pool. Each endpoint admits at most
+API_CONCURRENCY[endpoint] requests at once; up to API_MAX_QUEUE more may
+wait for a slot. Beyond that a request fails at once with 429, and one that
+waits longer than API_QUEUE_TIMEOUT gets 503, both with Retry-After.
+
+Every request has a deadline (API_TIMEOUTS, optionally shortened by the
+request's ``timeout``). Generation checks it between tokens and stops, and
+the request gets 504. Calls that cannot be interrupted (CodeBERT scoring,
+the chat chain) are abandoned at the deadline instead, but keep their slot
+until they finish so the concurrency limit still holds.
+
+/execute runs arbitrary code and /chat reaches the knowledge base, so every
+model and sandbox endpoint requires API_TOKEN as a bearer token. Without a
+token configured they only serve clients on the loopback interface.
+/health, /ready and /metrics stay open for probes and scrapers.
+"""
+import asyncio
+import hmac
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel
+
+from config import API_CONCURRENCY, API_MAX_QUEUE, API_QUEUE_TIMEOUT, API_TIMEOUTS, API_TOKEN, METRICS_ENABLED
+from code_assistant import CodeAssistant
+from llm.metrics import register_gauge, render as render_metrics, timed, REQUESTS
+from llm.registry import is_loaded, model_status
+from llm.stopping import DeadlineExceeded
+
+# Seconds clients are told to wait before retrying a rejected request
+RETRY_AFTER = 1
+
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+
+class WriteRequest(BaseModel):
+    description: str
+    language: str = "python"
+    timeout: Optional[float] = None
+
+
+class DebugRequest(BaseModel):
+    code: str
+    error_message: str = ""
+    timeout: Optional[float] = None
+
+
+class ReviewRequest(BaseModel):
+    code: str
+    timeout: Optional[float] = None
+
+
+class ExecuteRequest(BaseModel):
+    code: str
+    language: str = "python"
+    timeout: Optional[float] = None
+
+
+class ChatRequest(BaseModel):
+    query: str
+    timeout: Optional[float] = None
+
+
+class Overloaded(Exception):
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class EndpointLimiter:
+    """Concurrency limit plus a bounded wait queue for one endpoint.
+
+    Only touched from the event loop thread, so the counters need no lock.
+    """
+
+    def __init__(self, name, concurrency, max_queue):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def acquire(self, timeout):
+        if not self._semaphore.locked() and not self.waiting:
+            await self._semaphore.acquire()  # a free slot is taken without yielding
+            self.active += 1
+            return
+        if self.waiting >= self.max_queue:
+            raise Overloaded(429, f"too many {self.name} requests waiting")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise Overloaded(503, f"no {self.name} slot became free in time")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self):
+        return {"active": self.active, "waiting": self.waiting, "limit": self.concurrency}
+
+
+app = FastAPI(title="AI Code Assistant API")
+assistant = CodeAssistant()
+executor = ThreadPoolExecutor(max_workers=sum(API_CONCURRENCY.values()), thread_name_prefix="api")
+limiters = {name: EndpointLimiter(name, limit, API_MAX_QUEUE) for name, limit in API_CONCURRENCY.items()}
+
+for _name, _limiter in limiters.items():
+    register_gauge("assistant_queue_depth", "Requests waiting", lambda limiter=_limiter: limiter.waiting,
+                   queue=f"api_{_name}")
+
+
+def queue_depth():
+    return sum(limiter.waiting for limiter in limiters.values())
+
+
+async def run_limited(endpoint, fn, timeout=None):
+    """Run fn(deadline=...) on the executor under the endpoint's limits; maps overload and deadline errors"""
+    budget = API_TIMEOUTS[endpoint]
+    if timeout is not None:
+        budget = min(budget, max(timeout, 0))
+    deadline = time.monotonic() + budget
+    limiter = limiters[endpoint]
+
+    try:
+        await limiter.acquire(min(API_QUEUE_TIMEOUT, budget))
+    except Overloaded as e:
+        REQUESTS.inc(endpoint=endpoint, outcome=f"rejected_{e.status_code}")
+        raise HTTPException(e.status_code, e.detail, headers={"Retry-After": str(RETRY_AFTER)})
+
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(executor, partial(fn, deadline=deadline))
+    # The slot is freed when the work ends, even if the request has already timed out
+    future.add_done_callback(lambda _: limiter.release())
+    try:
+        with timed(f"api_{endpoint}"):
+            # A little grace so cooperative deadlines surface as DeadlineExceeded
+            result = await asyncio.wait_for(asyncio.shield(future), deadline - time.monotonic() + 1)
+    except (asyncio.TimeoutError, DeadlineExceeded):
+        REQUESTS.inc(endpoint=endpoint, outcome="deadline")
+        raise HTTPException(504, f"{endpoint} request exceeded its deadline")
+    except Exception:
+        REQUESTS.inc(endpoint=endpoint, outcome="error")
+        raise
+    REQUESTS.inc(endpoint=endpoint, outcome="ok")
+    return result
+
+
+def require_token(request: Request, authorization: Optional[str] = Header(None)):
+    """Check the bearer token, or without API_TOKEN only admit local clients"""
+    if API_TOKEN is None:
+        if request.client is None or request.client.host not in LOOPBACK_HOSTS:
+            raise HTTPException(403, "set API_TOKEN to serve this endpoint to other hosts")
+        return
+    expected = f"Bearer {API_TOKEN}".encode("utf-8")
+    if authorization is None or not hmac.compare_digest(authorization.encode("utf-8"), expected):
+        raise HTTPException(401, "missing or invalid API token", headers={"WWW-Authenticate": "Bearer"})
+
+
+def _chat(query, deadline=None):
+    # Imported on first use: app.py builds the Gradio UI and the RAG chain registrations
+    from app import answer_query
+    answer, sources = answer_query(query)
+    return {"answer": answer, "sources": sources}
+
+
+@app.post("/write", dependencies=[Depends(require_token)])
+async def write(request: WriteRequest):
+    return await run_limited(
+        "write", partial(assistant.write_code, request.description, request.language), request.timeout
+    )
+
+
+@app.post("/debug", dependencies=[Depends(require_token)])
+async def debug(request: DebugRequest):
+    return await run_limited(
+        "debug", partial(assistant.debug_code, request.code, request.error_message), request.timeout
+    )
+
+
+@app.post("/review", dependencies=[Depends(require_token)])
+async def review(request: ReviewRequest):
+    return await run_limited("review", partial(assistant.code_review, request.code), request.timeout)
+
+
+@app.post("/execute", dependencies=[Depends(require_token)])
+async def execute(request: ExecuteRequest):
+    return await run_limited(
+        "execute", partial(assistant.execute_code, request.code, request.language), request.timeout
+    )
+
+
+@app.post("/chat", dependencies=[Depends(require_token)])
+async def chat(request: ChatRequest):
+    return await run_limited("chat", partial(_chat, request.query), request.timeout)
+
+
+@app.get("/health")
+async def health():
+    # Liveness: answers while models load and under any load
+    return {
+        "status": "ok",
+        "models": model_status(),
+        "queue_depth": queue_depth(),
+        "endpoints": {name: limiter.stats() for name, limiter in limiters.items()}
+    }
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness for load balancers: 503 until the models are loaded or while every endpoint queue is full"""
+    loaded = is_loaded(assistant.code_llm.code_model_key) and is_loaded(assistant.code_llm.analysis_model_key)
+    saturated = all(limiter.waiting >= limiter.max_queue for limiter in limiters.values())
+    body = {"ready": loaded and not saturated, "models_loaded": loaded, "queue_depth": queue_depth()}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(404, "Metrics are disabled")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+def run_api(host, port):
+    import uvicorn
+    uvicorn.run(app, host=host, port=port)
@@ -1,15 +1,40 @@
 import gradio as gr
 from llm.load_llm import load_llm
-from rag.vectorstore import get_vectorstore
+from rag.vectorstore import store_version  # also registers the shared vector store
+import rag.bm25_index  # registers the shared BM25 index
 from rag.rag_chain import create_qa_chain
+from rag.semantic_cache import SemanticCache
 from auth.github_oauth import app as oauth_app, session
 from flask import jsonify
+from llm.registry import register_model, get_model, warm_up
+from llm.metrics import timed, watch_cache, REQUESTS
+from config import ENABLE_HYBRID_RETRIEVAL
+from config import ENABLE_SEMANTIC_CACHE, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_TTL
 import threading
 
-# Load components once
-llm_pipeline = load_llm()
-vectorstore = get_vectorstore()
-qa_chain = create_qa_chain(llm_pipeline, vectorstore)
+# Components load on first use (or during warm-up) and are shared process-wide
+register_model("rag_llm", load_llm)
+register_model("qa_chain", lambda: create_qa_chain(
+    get_model("rag_llm"),
+    get_model("vectorstore"),
+    get_model("bm25_index") if ENABLE_HYBRID_RETRIEVAL else None
+))
+
+def _load_semantic_cache():
+    cache = SemanticCache(
+        get_model("embeddings"),
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl_seconds=SEMANTIC_CACHE_TTL,
+        version_fn=store_version
+    )
+    watch_cache("semantic", cache.stats)
+    return cache
+
+register_model("semantic_cache", _load_semantic_cache)
+
+def get_qa_chain():
+    return get_model("qa_chain")
 
 def get_user_display_name():
     user_info = session.get('user_info', {})
@@ -18,11 +43,50 @@ def get_user_display_name():
 def chat_interface(query):
     # Check if user is authenticated
     if 'oauth_token' not in session:
+        REQUESTS.inc(endpoint="chat", outcome="unauthenticated")
         return "Please login with GitHub first"
     
     user_name = get_user_display_name()
-    response = qa_chain.run(query)
-    return f"[{user_name}] {response}"
+    try:
+        with timed("chat"):
+            answer, sources = answer_query(query)
+    except Exception:
+        REQUESTS.inc(endpoint="chat", outcome="error")
+        raise
+    REQUESTS.inc(endpoint="chat", outcome="ok")
+    response = f"[{user_name}] {answer}"
+    if sources:
+        response += "\n\nSources: " + ", ".join(sources)
+    return response
+
+def answer_query(query):
+    """Answer and source list for a question, from the semantic cache when a similar one was asked"""
+    if not ENABLE_SEMANTIC_CACHE:
+        return _run_qa_chain(query)
+    
+    cache = get_model("semantic_cache")
+    with timed("semantic_cache_lookup"):
+        vector = cache.embed(query)
+        cached = cache.lookup(query, vector)
+    if cached is not None:
+        return cached
+    
+    answer, sources = _run_qa_chain(query)
+    cache.put(query, answer, sources, vector)
+    return answer, sources
+
+def _run_qa_chain(query):
+    with timed("qa_chain"):
+        result = get_qa_chain()({"query": query})
+    sources = []
+    for doc in result.get("source_documents", []):
+        metadata = doc.metadata
+        source = metadata.get("source", "")
+        if metadata.get("repo"):
+            source = f"{metadata['repo']}/{metadata.get('path', '')}"
+        if source and source not in sources:
+            sources.append(source)
+    return result["result"], sources
 
 # Create Gradio interface with user info
 def create_interface():
@@ -60,6 +124,9 @@ def run_gradio():
     )
 
 if __name__ == "__main__":
+    # Load the QA chain in the background; the servers answer while it loads
+    warm_up(["qa_chain"])
+    
     # Start Gradio in a separate thread
     import threading
     threading.Thread(target=run_gradio, daemon=True).start()
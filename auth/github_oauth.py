@@ -1,4 +1,4 @@
-from flask import Flask, request, redirect, session, jsonify
+from flask import Flask, Response, request, redirect, session, jsonify
 from requests_oauthlib import OAuth2Session
 import sys
 import os
@@ -10,11 +10,15 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from config import (
     GITHUB_CLIENT_ID,
     GITHUB_CLIENT_SECRET,
-    GITHUB_OAUTH_DOMAIN
+    GITHUB_OAUTH_DOMAIN,
+    METRICS_ENABLED
 )
+from llm.registry import model_status, is_loaded, get_model
+from llm.metrics import render as render_metrics
 
 
-oauth_app = Flask(__name__)
+app = Flask(__name__)
+oauth_app = app
 app.secret_key = os.urandom(24)
 
 # GitHub OAuth endpoints
@@ -93,6 +97,21 @@ def check_auth():
         'user': session.get('user_info', None)
     })
 
+@app.route('/health')
+def health():
+    # Answers while weights are still loading; "models" reports their load state
+    return jsonify({
+        'status': 'ok',
+        'models': model_status(),
+        'semantic_cache': get_model('semantic_cache').stats() if is_loaded('semantic_cache') else None
+    })
+
+@app.route('/metrics')
+def prometheus_metrics():
+    if not METRICS_ENABLED:
+        return "Metrics are disabled\n", 404
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 # Method to mount Gradio app
 def mount_gradio_app(gradio_app):
     from gradio.routes import App
@@ -0,0 +1,175 @@
+"""Compare fp32 and dynamic int8 CPU inference for CodeGen and CodeBERT.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_quantization [--new-tokens 64] [--output results.json]
+
+Each variant runs in a fresh process so resident memory is measured cleanly.
+Reported per variant: load time, RSS, decode latency per token and CodeBERT
+scoring latency; across variants: the speedup, the RSS ratio and how often
+the int8 outputs agree with fp32 (greedy tokens and bug/no-bug labels).
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+PROMPTS = [
+    "# Write python code for: read a CSV file and return the rows as dicts\n",
+    "def fibonacci(n):\n",
+    "# Write python code for: a thread-safe LRU cache class\n",
+    "import re\n\ndef is_valid_email(address):\n",
+    "# Write python code for: merge two sorted lists\n",
+    "class Stack:\n    def __init__(self):\n",
+    "# Write python code for: download a URL with retries\n",
+    "def binary_search(items, target):\n",
+]
+
+SNIPPETS = [
+    "def add(a, b):\n    return a + b\n",
+    "for i in range(10)\n    print(i)\n",
+    "def divide(a, b):\n    return a / b\n",
+    "items = [1, 2, 3]\nprint(items[3])\n",
+    "with open('data.txt') as f:\n    data = f.read()\n",
+    "def greet(name):\n    print('Hello ' + name)\n",
+]
+
+
+def _rss_mb():
+    with open("/proc/self/status", "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def run_variant(variant, new_tokens, threads):
+    import torch
+    from transformers import AutoTokenizer, AutoModelForCausalLM
+    from transformers import RobertaTokenizer, RobertaForSequenceClassification
+    from config import CODE_MODEL_NAME, ANALYSIS_MODEL_NAME, QUANTIZED_MODEL_DIR
+    from llm.quantization import load_quantized
+
+    torch.set_num_threads(threads)
+    base_rss = _rss_mb()
+
+    start = time.perf_counter()
+    load_code = lambda: AutoModelForCausalLM.from_pretrained(CODE_MODEL_NAME, torch_dtype=torch.float32).eval()
+    load_bert = lambda: RobertaForSequenceClassification.from_pretrained(ANALYSIS_MODEL_NAME, num_labels=2).eval()
+    if variant == "int8":
+        code_model = load_quantized(CODE_MODEL_NAME, load_code, QUANTIZED_MODEL_DIR)
+        bert_model = load_quantized(ANALYSIS_MODEL_NAME, load_bert, QUANTIZED_MODEL_DIR)
+    else:
+        code_model = load_code()
+        bert_model = load_bert()
+    load_seconds = time.perf_counter() - start
+    code_tokenizer = AutoTokenizer.from_pretrained(CODE_MODEL_NAME)
+    bert_tokenizer = RobertaTokenizer.from_pretrained(ANALYSIS_MODEL_NAME)
+
+    # Untimed warm-up so one-off allocations do not land on the first prompt
+    warm = code_tokenizer(PROMPTS[0], return_tensors="pt")
+    with torch.inference_mode():
+        code_model.generate(**warm, max_new_tokens=4, do_sample=False, pad_token_id=code_tokenizer.eos_token_id)
+
+    ms_per_token = []
+    tokens = []
+    with torch.inference_mode():
+        for prompt in PROMPTS:
+            inputs = code_tokenizer(prompt, return_tensors="pt")
+            start = time.perf_counter()
+            output = code_model.generate(
+                **inputs,
+                max_new_tokens=new_tokens,
+                min_new_tokens=new_tokens,
+                do_sample=False,
+                pad_token_id=code_tokenizer.eos_token_id
+            )
+            ms_per_token.append((time.perf_counter() - start) * 1000 / new_tokens)
+            tokens.append(output[0, inputs["input_ids"].shape[1]:].tolist())
+
+        start = time.perf_counter()
+        batch = bert_tokenizer(SNIPPETS, return_tensors="pt", padding=True, truncation=True, max_length=512)
+        probabilities = torch.softmax(bert_model(**batch).logits, dim=-1).tolist()
+        scoring_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "variant": variant,
+        "load_seconds": load_seconds,
+        "rss_mb": _rss_mb() - base_rss,
+        "ms_per_token": statistics.mean(ms_per_token),
+        "ms_per_token_p50": statistics.median(ms_per_token),
+        "scoring_ms": scoring_ms,
+        "tokens": tokens,
+        "probabilities": probabilities
+    }
+
+
+def compare(fp32, int8):
+    exact = sum(a == b for a, b in zip(fp32["tokens"], int8["tokens"]))
+    prefix = []
+    for a, b in zip(fp32["tokens"], int8["tokens"]):
+        same = next((i for i, (x, y) in enumerate(zip(a, b)) if x != y), min(len(a), len(b)))
+        prefix.append(same / max(len(a), 1))
+    labels = sum(
+        max(range(2), key=p.__getitem__) == max(range(2), key=q.__getitem__)
+        for p, q in zip(fp32["probabilities"], int8["probabilities"])
+    )
+    return {
+        "decode_speedup": fp32["ms_per_token"] / int8["ms_per_token"],
+        "scoring_speedup": fp32["scoring_ms"] / int8["scoring_ms"],
+        "rss_ratio": int8["rss_mb"] / max(fp32["rss_mb"], 1e-9),
+        "identical_generations": exact / len(PROMPTS),
+        "mean_matching_prefix": statistics.mean(prefix),
+        "label_agreement": labels / len(SNIPPETS),
+        "max_probability_diff": max(
+            abs(x - y)
+            for p, q in zip(fp32["probabilities"], int8["probabilities"])
+            for x, y in zip(p, q)
+        )
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fp32 vs int8 inference benchmark")
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--output", help="Write the full results as JSON")
+    parser.add_argument("--variant", choices=["fp32", "int8"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.new_tokens, args.threads)))
+        return
+
+    results = {}
+    for variant in ("fp32", "int8"):
+        print(f"Running {variant}...")
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_quantization", "--variant", variant,
+             "--new-tokens", str(args.new_tokens), "--threads", str(args.threads)],
+            capture_output=True, text=True, check=True
+        )
+        results[variant] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    comparison = compare(results["fp32"], results["int8"])
+    for variant in ("fp32", "int8"):
+        r = results[variant]
+        print(f"{variant:>5}: load {r['load_seconds']:.1f}s, RSS {r['rss_mb']:.0f} MB, "
+              f"decode {r['ms_per_token']:.1f} ms/token, scoring {r['scoring_ms']:.0f} ms")
+    print(f"decode speedup {comparison['decode_speedup']:.2f}x, "
+          f"scoring speedup {comparison['scoring_speedup']:.2f}x, "
+          f"RSS ratio {comparison['rss_ratio']:.2f}")
+    print(f"identical generations {comparison['identical_generations']:.0%}, "
+          f"mean matching prefix {comparison['mean_matching_prefix']:.0%}, "
+          f"label agreement {comparison['label_agreement']:.0%}, "
+          f"max probability diff {comparison['max_probability_diff']:.3f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"results": results, "comparison": comparison}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
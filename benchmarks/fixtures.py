@@ -0,0 +1,145 @@
+"""Offline fixtures for the benchmark suite: a synthetic corpus and tiny random models.
+
+Nothing here touches the network. The tokenizer is a byte-level BPE trained
+on the synthetic corpus, and the models are randomly initialized CodeGen and
+RoBERTa configurations small enough to run on any CPU. Their outputs are
+meaningless; only the cost of running them matters.
+"""
+import random
+from pathlib import Path
+
+from scrape.shards import ShardWriter
+
+SPECIAL_TOKENS = ["<s>", "<pad>", "</s>", "<unk>", "<mask>", "<|endoftext|>"]
+
+_WORDS = [
+    "user", "order", "item", "price", "total", "cache", "node", "tree", "value", "index",
+    "buffer", "request", "response", "config", "path", "name", "count", "result", "data", "key",
+]
+
+_TEMPLATES = [
+    "def {f}({a}, {b}):\n    {c} = {a} + {b}\n    return {c} * 2\n",
+    "def {f}({a}):\n    {c} = []\n    for {b} in {a}:\n        if {b}:\n            {c}.append({b})\n    return {c}\n",
+    "class {F}:\n    def __init__(self, {a}):\n        self.{a} = {a}\n\n    def {f}(self):\n        return self.{a}\n",
+    "def {f}({a}, {b}=None):\n    try:\n        return {a}[{b}]\n    except KeyError:\n        return None\n",
+    "import json\n\ndef {f}({a}):\n    with open({a}) as fh:\n        {c} = json.load(fh)\n    return {c}.get('{b}')\n",
+]
+
+
+def _identifier(rng, parts=2):
+    return "_".join(rng.choice(_WORDS) for _ in range(parts))
+
+
+def synthetic_snippet(rng):
+    """A random but syntactically plausible Python snippet"""
+    template = rng.choice(_TEMPLATES)
+    name = _identifier(rng)
+    return template.format(
+        f=name,
+        F="".join(part.title() for part in name.split("_")),
+        a=rng.choice(_WORDS),
+        b=_identifier(rng, 1) + "_b",
+        c=_identifier(rng, 1) + "_c",
+    )
+
+
+def synthetic_snippets(count, seed=0):
+    rng = random.Random(seed)
+    return [synthetic_snippet(rng) for _ in range(count)]
+
+
+def write_corpus(data_dir, records=2000, seed=0):
+    """Write GitHub-style records in the scrapers' shard format; returns data_dir"""
+    data_dir = Path(data_dir)
+    rng = random.Random(seed)
+    with ShardWriter(data_dir / "github" / "python", "python_samples", 500) as writer:
+        for i in range(records):
+            # Several snippets per file, like real source files
+            content = "\n\n".join(synthetic_snippet(rng) for _ in range(rng.randint(2, 8)))
+            writer.write({
+                "repo": f"bench/repo-{i % 50}",
+                "file_path": f"src/module_{i}.py",
+                "content": content,
+                "language": "python",
+                "stars": rng.randint(0, 1000)
+            })
+            if i % 100 == 99:
+                writer.mark_done(f"batch-{i // 100}")
+    return data_dir
+
+
+def build_tokenizer_files(output_dir, vocab_size=2000):
+    """Train a byte-level BPE on synthetic code; returns (vocab.json, merges.txt) paths"""
+    from tokenizers import ByteLevelBPETokenizer
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer = ByteLevelBPETokenizer()
+    tokenizer.train_from_iterator(
+        synthetic_snippets(2000, seed=1),
+        vocab_size=vocab_size,
+        special_tokens=SPECIAL_TOKENS,
+        show_progress=False
+    )
+    vocab, merges = tokenizer.save_model(str(output_dir))
+    return vocab, merges
+
+
+def build_code_model(output_dir, vocab, merges):
+    """Tiny random CodeGen model with a GPT-2 style tokenizer, saved for from_pretrained"""
+    from transformers import CodeGenConfig, CodeGenForCausalLM, GPT2TokenizerFast
+
+    tokenizer = GPT2TokenizerFast(
+        vocab_file=vocab,
+        merges_file=merges,
+        bos_token="<|endoftext|>",
+        eos_token="<|endoftext|>",
+        unk_token="<|endoftext|>"
+    )
+    config = CodeGenConfig(
+        vocab_size=len(tokenizer),
+        n_positions=2048,
+        n_ctx=2048,
+        n_embd=128,
+        n_layer=2,
+        n_head=4,
+        rotary_dim=16,
+        bos_token_id=tokenizer.bos_token_id,
+        eos_token_id=tokenizer.eos_token_id
+    )
+    tokenizer.save_pretrained(output_dir)
+    CodeGenForCausalLM(config).save_pretrained(output_dir)
+    return str(output_dir)
+
+
+def build_analysis_model(output_dir, vocab, merges):
+    """Tiny random RoBERTa classifier with a CodeBERT-style tokenizer"""
+    from transformers import RobertaConfig, RobertaForSequenceClassification, RobertaTokenizer
+
+    tokenizer = RobertaTokenizer(vocab_file=vocab, merges_file=merges)
+    config = RobertaConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=128,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        intermediate_size=256,
+        max_position_embeddings=514,
+        type_vocab_size=1,
+        pad_token_id=tokenizer.pad_token_id,
+        num_labels=2
+    )
+    tokenizer.save_pretrained(output_dir)
+    RobertaForSequenceClassification(config).save_pretrained(output_dir)
+    return str(output_dir)
+
+
+def build_models(work_dir):
+    """Build both models under work_dir; returns (code model path, analysis model path)"""
+    import torch
+
+    torch.manual_seed(0)
+    work_dir = Path(work_dir)
+    vocab, merges = build_tokenizer_files(work_dir / "tokenizer")
+    code_model = build_code_model(work_dir / "codegen", vocab, merges)
+    analysis_model = build_analysis_model(work_dir / "codebert", vocab, merges)
+    return code_model, analysis_model
@@ -0,0 +1,306 @@
+"""Offline benchmarks for the assistant's hot paths.
+
+Run from the repository root:
+
+    python -m benchmarks.run [--only generate,retrieval] [--output results.json]
+                             [--baseline baseline.json] [--tolerance 0.2] [--save-baseline]
+
+Everything runs on CPU against tiny randomly initialized models and a
+synthetic corpus built in a temporary directory (see benchmarks.fixtures),
+so no network access or downloaded weights are needed. The numbers track
+the cost of the surrounding code paths, not model quality.
+
+Metrics ending in ``_per_sec`` are better when higher and metrics ending in
+``_ms`` are better when lower. With --baseline, any metric that is worse than
+the baseline by more than --tolerance is reported and the exit status is 1.
+"""
+import os
+
+# Set before transformers / huggingface_hub are imported anywhere
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+os.environ.setdefault("HF_DATASETS_OFFLINE", "1")
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCHMARKS = ["generate", "quality", "execute", "retrieval", "dataloader"]
+
+EXECUTE_SNIPPETS = [
+    "print(sum(range(1000)))",
+    "import json\nprint(json.dumps({'a': [1, 2, 3]}))",
+    "def fib(n):\n    return n if n < 2 else fib(n - 1) + fib(n - 2)\nprint(fib(15))",
+    "raise ValueError('expected failure')",
+]
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def _latency(prefix, seconds):
+    ms = [s * 1000 for s in seconds]
+    return {
+        f"{prefix}_p50_ms": statistics.median(ms),
+        f"{prefix}_p95_ms": _percentile(ms, 95),
+    }
+
+
+def bench_generate(llm, args):
+    from benchmarks.fixtures import synthetic_snippets
+
+    # Distinct prompts, and no result cache, so every call really decodes
+    llm.result_cache = None
+    prompts = [f"# Write python code for: {s.splitlines()[0]}\n" for s in synthetic_snippets(args.repeats + 1, seed=7)]
+    llm.generate_code(prompts[-1], max_new_tokens=8)  # warm-up
+
+    tokens = 0
+    elapsed = 0.0
+    first_token = []
+    for prompt in prompts[:args.repeats]:
+        start = time.perf_counter()
+        code = llm.generate_code(prompt, max_new_tokens=args.new_tokens)
+        elapsed += time.perf_counter() - start
+        tokens += max(1, len(llm.code_tokenizer(code)["input_ids"]))
+
+        start = time.perf_counter()
+        stream = llm.generate_code_stream(prompt, max_new_tokens=args.new_tokens)
+        for _ in stream:
+            first_token.append(time.perf_counter() - start)
+            break
+        stream.close()
+
+    results = {"generate_tokens_per_sec": tokens / elapsed}
+    if first_token:
+        results.update(_latency("generate_ttft", first_token))
+    return results
+
+
+def bench_quality(llm, args):
+    from benchmarks.fixtures import synthetic_snippets
+
+    llm.result_cache = None
+    snippets = synthetic_snippets(args.snippets, seed=11)
+    # analyze_code_quality_batch is a generator: nothing is scored until it is consumed
+    list(llm.analyze_code_quality_batch(snippets[:4]))  # warm-up
+
+    start = time.perf_counter()
+    scored = list(llm.analyze_code_quality_batch(snippets))
+    batch_seconds = time.perf_counter() - start
+    assert len(scored) == len(snippets), f"scored {len(scored)} of {len(snippets)} snippets"
+
+    single = []
+    for snippet in snippets[:args.repeats]:
+        start = time.perf_counter()
+        llm.analyze_code_quality(snippet)
+        single.append(time.perf_counter() - start)
+
+    return {
+        "quality_snippets_per_sec": len(snippets) / batch_seconds,
+        **_latency("quality_single", single),
+    }
+
+
+def bench_execute(args):
+    from code_assistant import CodeAssistant
+
+    assistant = CodeAssistant()
+    assistant.execute_code(EXECUTE_SNIPPETS[0])  # warm-up, starts the sandbox workers
+
+    seconds = []
+    for i in range(args.repeats * len(EXECUTE_SNIPPETS)):
+        start = time.perf_counter()
+        assistant.execute_code(EXECUTE_SNIPPETS[i % len(EXECUTE_SNIPPETS)])
+        seconds.append(time.perf_counter() - start)
+
+    if assistant.sandbox is not None:
+        assistant.sandbox.close()
+    return _latency("execute", seconds)
+
+
+def bench_retrieval(args, work_dir):
+    import chromadb
+    import numpy as np
+    from benchmarks.fixtures import synthetic_snippets
+    from rag.bm25_index import BM25Index
+
+    rng = np.random.default_rng(0)
+    dim = 384  # all-MiniLM-L6-v2
+    queries = rng.standard_normal((args.repeats * 5, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    texts = synthetic_snippets(max(args.corpus_sizes), seed=3)
+
+    results = {}
+    for size in args.corpus_sizes:
+        client = chromadb.PersistentClient(path=str(work_dir / f"chroma-{size}"))
+        collection = client.get_or_create_collection("langchain")
+        vectors = rng.standard_normal((size, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        # Chroma caps the number of records per add
+        for start in range(0, size, 5000):
+            stop = min(start + 5000, size)
+            collection.add(
+                ids=[str(i) for i in range(start, stop)],
+                embeddings=vectors[start:stop].tolist(),
+                documents=texts[start:stop]
+            )
+
+        collection.query(query_embeddings=[queries[0].tolist()], n_results=4)  # warm-up
+        seconds = []
+        for query in queries:
+            start = time.perf_counter()
+            collection.query(query_embeddings=[query.tolist()], n_results=4)
+            seconds.append(time.perf_counter() - start)
+        results.update(_latency(f"chroma_{size}_query", seconds))
+
+        index = BM25Index(work_dir / f"bm25-{size}.sqlite3")
+        index.add([str(i) for i in range(size)], texts[:size])
+        seconds = []
+        for text in texts[:len(queries)]:
+            start = time.perf_counter()
+            index.search(text.splitlines()[0], k=20)
+            seconds.append(time.perf_counter() - start)
+        results.update(_latency(f"bm25_{size}_query", seconds))
+    return results
+
+
+def bench_dataloader(args, work_dir, code_model_path):
+    from torch.utils.data import DataLoader
+    from transformers import AutoTokenizer
+    from benchmarks.fixtures import write_corpus
+    from training.corpus import corpus_files
+    from training.packing import DynamicPaddingCollator
+    from training.streaming import StreamingCodeDataset
+
+    data_dir = write_corpus(work_dir / "corpus", records=args.records)
+    tokenizer = AutoTokenizer.from_pretrained(code_model_path)
+    tokenizer.pad_token = tokenizer.eos_token
+
+    results = {}
+    for pack in (False, True):
+        dataset = StreamingCodeDataset(corpus_files(data_dir), tokenizer, "train", max_length=512,
+                                       shuffle_buffer=1000, pack=pack)
+        loader = DataLoader(
+            dataset,
+            batch_size=8,
+            num_workers=args.num_workers,
+            collate_fn=DynamicPaddingCollator(tokenizer.pad_token_id)
+        )
+        samples = 0
+        start = time.perf_counter()
+        for batch in loader:
+            samples += batch["input_ids"].shape[0]
+        name = "packed" if pack else "unpacked"
+        results[f"dataloader_{name}_samples_per_sec"] = samples / (time.perf_counter() - start)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Metrics worse than baseline by more than tolerance, as (name, baseline, current, change)"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        change = (current - previous) / previous
+        if name.endswith("_per_sec") and change < -tolerance:
+            regressions.append((name, previous, current, change))
+        elif name.endswith("_ms") and change > tolerance:
+            regressions.append((name, previous, current, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the code assistant")
+    parser.add_argument("--only", help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Compare against a results file written by --output")
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite --baseline with these results")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown (default 0.2)")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--snippets", type=int, default=64)
+    parser.add_argument("--corpus-sizes", default="1000,10000,50000")
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--num-workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    selected = args.only.split(",") if args.only else BENCHMARKS
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    args.corpus_sizes = [int(size) for size in args.corpus_sizes.split(",")]
+
+    import torch
+    from benchmarks.fixtures import build_models
+    from llm.code_llm import CodeLLM, load_code_model, load_analysis_model
+    from llm.registry import register_model
+
+    torch.set_num_threads(args.threads)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="llm-bench-") as tmp:
+        work_dir = Path(tmp)
+        print("Building tiny models...")
+        code_model_path, analysis_model_path = build_models(work_dir / "models")
+        register_model("bench-codegen", lambda: load_code_model(code_model_path))
+        register_model("bench-codebert", lambda: load_analysis_model(analysis_model_path))
+        llm = CodeLLM(code_model="bench-codegen", analysis_model="bench-codebert")
+
+        for name in selected:
+            print(f"Running {name}...")
+            start = time.perf_counter()
+            if name == "generate":
+                results.update(bench_generate(llm, args))
+            elif name == "quality":
+                results.update(bench_quality(llm, args))
+            elif name == "execute":
+                results.update(bench_execute(args))
+            elif name == "retrieval":
+                results.update(bench_retrieval(args, work_dir))
+            elif name == "dataloader":
+                results.update(bench_dataloader(args, work_dir, code_model_path))
+            print(f"  done in {time.perf_counter() - start:.1f}s")
+
+    for name, value in results.items():
+        print(f"{name:>40}: {value:.2f}")
+
+    report = {
+        "results": results,
+        "environment": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "threads": args.threads,
+        },
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for name, previous, current, change in regressions:
+            print(f"REGRESSION {name}: {previous:.2f} -> {current:.2f} ({change:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,49 @@
 import gradio as gr
 from llm.code_llm import CodeLLM
-from rag.vectorstore import get_vectorstore
+import rag.vectorstore  # registers the shared vector store
 from rag.rag_chain import create_qa_chain
+from llm.registry import get_model
+from llm.metrics import timed, register_gauge
+from llm.stopping import stop_mode_for
+from sandbox import SandboxPool, SandboxBusy, POOL_SUPPORTED
+from config import BATCH_MAX_SIZE, SUPPORTED_LANGUAGES
+from config import SANDBOX_POOL_SIZE, SANDBOX_MAX_QUEUE, SANDBOX_MAX_RUNS_PER_WORKER, SANDBOX_TIMEOUT
+from config import SANDBOX_CPU_SECONDS, SANDBOX_MEMORY_MB, SANDBOX_MAX_OUTPUT_KB
 import ast
+import itertools
 import subprocess
 import sys
+import time
 
 class CodeAssistant:
     def __init__(self):
+        # Models load on first use (or via llm.registry.warm_up), not here
         self.code_llm = CodeLLM()
-        self.vectorstore = get_vectorstore()
         
-    def write_code(self, description, language="python"):
+        for language in SUPPORTED_LANGUAGES:
+            self.code_llm.register_prompt_prefix(f"# Write {language} code for:")
+        
+        self.sandbox = None
+        if SANDBOX_POOL_SIZE > 0 and POOL_SUPPORTED:
+            self.sandbox = SandboxPool(
+                size=SANDBOX_POOL_SIZE,
+                max_queue=SANDBOX_MAX_QUEUE,
+                max_runs_per_worker=SANDBOX_MAX_RUNS_PER_WORKER,
+                cpu_seconds=SANDBOX_CPU_SECONDS,
+                memory_mb=SANDBOX_MEMORY_MB,
+                max_output_bytes=SANDBOX_MAX_OUTPUT_KB * 1024
+            )
+            register_gauge("assistant_queue_depth", "Requests waiting", self.sandbox.queue_depth, queue="sandbox")
+    
+    @property
+    def vectorstore(self):
+        return get_model("vectorstore")
+        
+    @timed("write_code")
+    def write_code(self, description, language="python", deadline=None):
         """Generate code based on description"""
-        prompt = f"# Write {language} code for: {description}\n# Code:\n"
-        generated_code = self.code_llm.generate_code(prompt)
+        prompt = self._write_prompt(description, language)
+        generated_code = self.code_llm.generate_code(prompt, stop_mode=stop_mode_for(language), deadline=deadline)
         
         # Analyze code quality
         quality = self.code_llm.analyze_code_quality(generated_code)
@@ -25,15 +54,36 @@ class CodeAssistant:
             "bug_probability": quality["bug_probability"]
         }
     
-    def debug_code(self, code, error_message=""):
+    def write_code_stream(self, description, language="python"):
+        """Generate code based on description, yielding partial results as it is decoded"""
+        generated_code = ""
+        prompt = self._write_prompt(description, language)
+        for piece in self.code_llm.generate_code_stream(prompt, stop_mode=stop_mode_for(language)):
+            generated_code += piece
+            yield {"code": generated_code}
+        
+        generated_code = generated_code.strip()
+        quality = self.code_llm.analyze_code_quality(generated_code)
+        
+        yield {
+            "code": generated_code,
+            "quality_score": quality["quality_score"],
+            "bug_probability": quality["bug_probability"]
+        }
+    
+    def _write_prompt(self, description, language):
+        return f"# Write {language} code for: {description}\n# Code:\n"
+    
+    @timed("debug_code")
+    def debug_code(self, code, error_message="", deadline=None):
         """Debug and fix code"""
         # First, analyze the code
         quality = self.code_llm.analyze_code_quality(code)
         
         if quality["bug_probability"] > 0.5:
             # Generate fix
-            fixed_code = self.code_llm.debug_code(code, error_message)
-            explanation = self.code_llm.explain_code(fixed_code)
+            fixed_code = self.code_llm.debug_code(code, error_message, deadline=deadline)
+            explanation = self.code_llm.explain_code(fixed_code, deadline=deadline)
             
             return {
                 "fixed_code": fixed_code,
@@ -46,19 +96,57 @@ class CodeAssistant:
                 "bug_probability": quality["bug_probability"]
             }
     
-    def execute_code(self, code, language="python"):
+    def debug_code_stream(self, code, error_message=""):
+        """Debug and fix code, yielding partial results as they are decoded"""
+        quality = self.code_llm.analyze_code_quality(code)
+        
+        if quality["bug_probability"] <= 0.5:
+            yield {
+                "message": "Code appears to be correct",
+                "bug_probability": quality["bug_probability"]
+            }
+            return
+        
+        fixed_code = ""
+        for piece in self.code_llm.debug_code_stream(code, error_message):
+            fixed_code += piece
+            yield {"fixed_code": fixed_code, "explanation": ""}
+        fixed_code = fixed_code.strip()
+        
+        explanation = ""
+        for piece in self.code_llm.explain_code_stream(fixed_code):
+            explanation += piece
+            yield {"fixed_code": fixed_code, "explanation": explanation}
+        
+        yield {
+            "fixed_code": fixed_code,
+            "explanation": explanation.strip(),
+            "original_bug_probability": quality["bug_probability"]
+        }
+    
+    @timed("execute")
+    def execute_code(self, code, language="python", deadline=None):
         """Safely execute code and return results"""
         if language == "python":
             try:
                 # Basic syntax check
                 ast.parse(code)
                 
+                # A request deadline can only shorten the run
+                timeout = SANDBOX_TIMEOUT
+                if deadline is not None:
+                    timeout = max(min(timeout, deadline - time.monotonic()), 0.1)
+                
+                # Run on a pre-warmed, rlimited worker when the platform allows it
+                if self.sandbox is not None:
+                    return self._execute_in_sandbox(code, timeout)
+                
                 # Execute in subprocess for safety
                 result = subprocess.run(
                     [sys.executable, "-c", code],
                     capture_output=True,
                     text=True,
-                    timeout=10
+                    timeout=timeout
                 )
                 
                 if result.returncode == 0:
@@ -70,16 +158,36 @@ class CodeAssistant:
                 return {"output": None, "error": f"Syntax Error: {str(e)}"}
             except subprocess.TimeoutExpired:
                 return {"output": None, "error": "Code execution timed out"}
+            except SandboxBusy:
+                return {"output": None, "error": "Too many code executions in progress, please try again shortly"}
             except Exception as e:
                 return {"output": None, "error": str(e)}
         else:
             return {"output": None, "error": f"Execution not supported for {language}"}
     
-    def code_review(self, code):
+    def _execute_in_sandbox(self, code, timeout):
+        result = self.sandbox.run(code, timeout=timeout)
+        
+        if result["timed_out"]:
+            return {"output": None, "error": "Code execution timed out"}
+        if result["returncode"] == 0 and not result["truncated"]:
+            return {"output": result["stdout"], "error": None}
+        return {"output": None, "error": result["stderr"] or f"Process exited with code {result['returncode']}"}
+    
+    @timed("code_review")
+    def code_review(self, code, deadline=None):
         """Provide code review and suggestions"""
         quality = self.code_llm.analyze_code_quality(code)
-        explanation = self.code_llm.explain_code(code)
-        
+        explanation = self.code_llm.explain_code(code, deadline=deadline)
+        return self._build_review(quality, explanation)
+    
+    def code_review_batch(self, codes):
+        """Review many snippets, scoring them in bulk; yields reviews in input order"""
+        codes, to_score = itertools.tee(codes)
+        for code, quality in zip(codes, self.code_llm.analyze_code_quality_batch(to_score)):
+            yield self._build_review(quality, self.code_llm.explain_code(code))
+    
+    def _build_review(self, quality, explanation):
         review = {
             "quality_score": quality["quality_score"],
             "bug_probability": quality["bug_probability"],
@@ -98,17 +206,21 @@ class CodeAssistant:
 # Create Gradio interface
 def create_code_interface():
     assistant = CodeAssistant()
+    stream_slots = BATCH_MAX_SIZE if assistant.code_llm.scheduler is not None else 1
     
     def write_code_interface(description, language):
-        result = assistant.write_code(description, language)
-        return result["code"], f"Quality: {result['quality_score']:.2f}, Bug Risk: {result['bug_probability']:.2f}"
+        for result in assistant.write_code_stream(description, language):
+            if "quality_score" in result:
+                yield result["code"], f"Quality: {result['quality_score']:.2f}, Bug Risk: {result['bug_probability']:.2f}"
+            else:
+                yield result["code"], "Generating..."
     
     def debug_code_interface(code, error_msg):
-        result = assistant.debug_code(code, error_msg)
-        if "fixed_code" in result:
-            return result["fixed_code"], result["explanation"]
-        else:
-            return code, result["message"]
+        for result in assistant.debug_code_stream(code, error_msg):
+            if "fixed_code" in result:
+                yield result["fixed_code"], result["explanation"]
+            else:
+                yield code, result["message"]
     
     def execute_code_interface(code):
         result = assistant.execute_code(code)
@@ -125,33 +237,46 @@ def create_code_interface():
                 description_input = gr.Textbox(label="Describe what you want to code", lines=3)
                 language_dropdown = gr.Dropdown(["python", "javascript", "java", "cpp"], value="python", label="Language")
             
-            write_btn = gr.Button("Generate Code")
+            with gr.Row():
+                write_btn = gr.Button("Generate Code")
+                write_stop_btn = gr.Button("Stop")
             
             with gr.Row():
                 generated_code = gr.Code(label="Generated Code", language="python")
                 quality_info = gr.Textbox(label="Quality Analysis")
             
-            write_btn.click(write_code_interface, [description_input, language_dropdown], [generated_code, quality_info])
+            # Concurrent streams share batched decodes in the BatchScheduler; without it
+            # (batching off or speculative decoding) each stream decodes alone
+            write_event = write_btn.click(write_code_interface, [description_input, language_dropdown], [generated_code, quality_info],
+                                          concurrency_limit=stream_slots)
+            # Cancelling closes the stream, which stops the decode and frees the model
+            write_stop_btn.click(None, None, None, cancels=[write_event])
         
         with gr.Tab("Debug Code"):
             with gr.Row():
                 buggy_code = gr.Code(label="Code to Debug", language="python", lines=10)
                 error_input = gr.Textbox(label="Error Message (optional)", lines=3)
             
-            debug_btn = gr.Button("Debug Code")
+            with gr.Row():
+                debug_btn = gr.Button("Debug Code")
+                debug_stop_btn = gr.Button("Stop")
             
             with gr.Row():
                 fixed_code = gr.Code(label="Fixed Code", language="python")
                 debug_explanation = gr.Textbox(label="Explanation", lines=5)
             
-            debug_btn.click(debug_code_interface, [buggy_code, error_input], [fixed_code, debug_explanation])
+            debug_event = debug_btn.click(debug_code_interface, [buggy_code, error_input], [fixed_code, debug_explanation],
+                                          concurrency_limit=stream_slots)
+            debug_stop_btn.click(None, None, None, cancels=[debug_event])
         
         with gr.Tab("Execute Code"):
             exec_code = gr.Code(label="Code to Execute", language="python", lines=10)
             exec_btn = gr.Button("Execute")
             exec_output = gr.Textbox(label="Output", lines=10)
             
-            exec_btn.click(execute_code_interface, exec_code, exec_output)
+            # The sandbox pool does its own queueing and turns away bursts beyond its queue
+            exec_btn.click(execute_code_interface, exec_code, exec_output,
+                           concurrency_limit=SANDBOX_POOL_SIZE + SANDBOX_MAX_QUEUE)
     
     return interface
 
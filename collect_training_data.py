@@ -4,7 +4,11 @@ from config import SUPPORTED_LANGUAGES, MAX_REPOS_TO_SCRAPE, MAX_SO_QUESTIONS
 import asyncio
 
 def collect_all_data():
-    """Collect training data from GitHub and StackOverflow"""
+    """Collect training data from GitHub and StackOverflow.
+    
+    Output is streamed to checkpointed shards, so rerunning after a crash
+    resumes where the previous run stopped.
+    """
     github_scraper = GitHubCodeScraper()
     so_scraper = StackOverflowScraper()
     
@@ -16,12 +20,12 @@ def collect_all_data():
         # Collect GitHub code samples
         print(f"Scraping GitHub repositories for {language}...")
         github_samples = github_scraper.scrape_and_save(language, MAX_REPOS_TO_SCRAPE)
-        print(f"Collected {len(github_samples)} code samples from GitHub")
+        print(f"Collected {github_samples} code samples from GitHub")
         
         # Collect StackOverflow Q&A
         print(f"Scraping StackOverflow for {language}...")
         so_samples = so_scraper.scrape_qa_pairs(language, MAX_SO_QUESTIONS)
-        print(f"Collected {len(so_samples)} Q&A pairs from StackOverflow")
+        print(f"Collected {so_samples} Q&A pairs from StackOverflow")
     
     print("\nData collection completed!")
 
@@ -1,6 +1,7 @@
 # Model Configuration
 MODEL_NAME = "microsoft/CodeBERT-base"  # Better for code tasks
 CODE_MODEL_NAME = "Salesforce/codegen-350M-mono"  # Specialized for code generation
+ANALYSIS_MODEL_NAME = "microsoft/codebert-base"  # Bug/quality classifier used by analyze_code_quality
 
 # GitHub OAuth Configuration
 GITHUB_CLIENT_ID = "Ov23liVPi4syOCSMQUrC"
@@ -24,9 +25,93 @@ STACKOVERFLOW_API_KEY = "rl_wXQbb16qcMbMuvnySQ3frEioa"  # Updated with the Stack
 TRAINING_DATA_DIR = "training_data/"
 MAX_REPOS_TO_SCRAPE = 1000
 MAX_SO_QUESTIONS = 5000
+SCRAPER_MAX_WORKERS = 16  # Concurrent requests per scraper, sharing one keep-alive session
+HTTP_CACHE_DIR = "cache/http/"  # ETag-revalidated API responses ("" disables)
+HTTP_CACHE_MAX_MB = 1024
+SHARD_RECORDS = 1000  # Records per compressed JSONL shard; checkpoints advance per shard
+DEDUP_DATA_DIR = "training_data_dedup/"  # Output of `main.py --mode dedup`, used by training when present
+DEDUP_NUM_PERM = 128  # MinHash permutations per record
+DEDUP_BANDS = 16  # LSH bands; 16 bands of 8 rows flag pairs above ~0.7 Jaccard similarity
+DEDUP_SHINGLE_SIZE = 5  # Tokens per shingle
+DEDUP_THRESHOLD = 0.7  # Estimated Jaccard similarity at which an LSH candidate counts as a near duplicate
 
 # Code Analysis Settings
 SUPPORTED_LANGUAGES = ["python", "javascript", "java", "cpp", "go", "rust"]
 MAX_CODE_LENGTH = 2048
 BATCH_SIZE = 16
 LEARNING_RATE = 5e-5
+TRAINING_MAX_STEPS = 10000  # Streamed datasets have no length, so training runs for a fixed number of steps
+DATALOADER_NUM_WORKERS = 4
+SHUFFLE_BUFFER_SIZE = 10000  # Records held in memory for shuffling the streamed corpus
+VALIDATION_PERCENT = 20  # Share of records hashed into the validation split
+TOKENIZED_DATA_DIR = "tokenized_data/"  # Output of `main.py --mode tokenize`, used by training when present
+TOKENIZE_BATCH_SIZE = 1000  # Texts per fast-tokenizer call
+TOKEN_SHARD_SIZE = 1 << 27  # Tokens per memory-mapped shard
+PACK_SEQUENCES = True  # Train on full blocks of EOS-joined documents instead of padded examples
+
+# Inference Settings
+CODE_MODEL_CONTEXT = 2048  # Prompt plus new tokens must fit in the model's context window
+WRITE_MAX_NEW_TOKENS = 256  # New-token budgets per task; decoding usually stops earlier at a stop condition
+DEBUG_MAX_NEW_TOKENS = 512  # On top of the length of the code being debugged, which the fix repeats
+EXPLAIN_MAX_NEW_TOKENS = 256
+ENABLE_REQUEST_BATCHING = True
+BATCH_MAX_SIZE = 8  # Max prompts decoded together in one generate call
+BATCH_MAX_WAIT_MS = 5  # How long the first prompt waits for others to join its batch
+ENABLE_PREFIX_CACHE = True
+PREFIX_CACHE_MAX_MB = 256  # Memory cap for cached prompt-prefix KV state
+PREFIX_CACHE_MIN_TOKENS = 16  # Shortest shared prefix worth resuming from (templates are exempt)
+SCORING_BATCH_SIZE = 32  # CodeBERT windows per forward pass in bulk scoring
+SCORING_CHUNK_SIZE = 256  # Snippets sorted into length buckets together
+SCORING_WINDOW_STRIDE = 256  # Token step between windows over snippets longer than 512 tokens
+SPECULATIVE_DECODING = False  # Greedy decoding only (DETERMINISTIC_GENERATION); replaces request batching
+SPECULATIVE_DRAFTER = "prompt_lookup"  # "prompt_lookup" (n-gram copies from the prompt) or "draft_model"
+DRAFT_MODEL_NAME = None  # Small causal LM sharing CODE_MODEL_NAME's tokenizer, for the "draft_model" drafter
+SPECULATIVE_NUM_TOKENS = 8  # Tokens drafted per verification pass
+PROMPT_LOOKUP_MAX_NGRAM = 3
+QUANTIZE_INT8 = False  # CPU only: dynamic int8 Linear layers for CodeGen and CodeBERT
+QUANTIZED_MODEL_DIR = "cache/quantized/"  # Converted models, so startup skips the conversion
+
+# Deterministic mode: greedy decoding, with generation and scoring results cached by input
+DETERMINISTIC_GENERATION = False
+RESULT_CACHE_DIR = "cache/results/"
+RESULT_CACHE_MEMORY_ENTRIES = 1024
+RESULT_CACHE_MAX_MB = 512
+
+# Code Execution Sandbox
+SANDBOX_POOL_SIZE = 4  # Pre-warmed workers, i.e. max snippets running at once (0 disables the pool)
+SANDBOX_MAX_QUEUE = 16  # Runs allowed to wait for a worker before new ones are refused
+SANDBOX_MAX_RUNS_PER_WORKER = 100  # Workers are recycled after this many runs
+SANDBOX_TIMEOUT = 10  # Wall-clock seconds per run
+SANDBOX_CPU_SECONDS = 5
+SANDBOX_MEMORY_MB = 256
+SANDBOX_MAX_OUTPUT_KB = 64
+
+# Knowledge Base
+KB_CHUNK_SIZE = 1000  # Characters per stored chunk
+KB_CHUNK_OVERLAP = 100
+KB_UPSERT_BATCH_SIZE = 256  # Chunks embedded and upserted per call
+INDEX_BATCH_SIZE = 1024  # Chunks per embedding task and Chroma upsert in `main.py --mode index`
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_CACHE_DIR = "cache/embeddings/"  # Vectors keyed by (model, text hash), reused across runs
+ENABLE_HYBRID_RETRIEVAL = True  # Fuse BM25 and vector search results in the QA chain
+BM25_INDEX_PATH = "db/bm25.sqlite3"  # Lexical index kept in step with the Chroma store
+RETRIEVER_K = 4  # Chunks passed to the LLM
+HYBRID_CANDIDATES = 20  # Results taken from each retriever before fusion
+RRF_K = 60  # Reciprocal rank fusion constant
+ENABLE_SEMANTIC_CACHE = True  # Answer near-repeat chat questions from earlier answers
+SEMANTIC_CACHE_THRESHOLD = 0.95  # Minimum cosine similarity between questions for a hit
+SEMANTIC_CACHE_MAX_ENTRIES = 1024
+SEMANTIC_CACHE_TTL = 3600  # Seconds
+
+# Monitoring
+METRICS_ENABLED = True  # Stage latency histograms and cache/queue gauges, served at /metrics
+METRICS_PORT = 9100  # /health and /metrics listener of `main.py --mode serve` (the Flask app and API serve their own)
+
+# Inference API (`main.py --mode api`)
+API_HOST = "127.0.0.1"  # Local only by default; set API_TOKEN before listening on other interfaces
+API_TOKEN = None  # When set, model and sandbox endpoints require "Authorization: Bearer <API_TOKEN>"
+API_PORT = 8000
+API_CONCURRENCY = {"write": 2, "debug": 2, "review": 2, "execute": 4, "chat": 2}  # Requests running at once per endpoint
+API_MAX_QUEUE = 16  # Requests allowed to wait per endpoint; more get 429
+API_QUEUE_TIMEOUT = 10  # Seconds a request may wait for a slot before it gets 503
+API_TIMEOUTS = {"write": 60, "debug": 120, "review": 90, "execute": 30, "chat": 60}  # Request deadlines in seconds
@@ -0,0 +1,117 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class _Request:
+    def __init__(self, prompt, deadline, streamer, cancel, params):
+        self.prompt = prompt
+        self.deadline = deadline
+        self.streamer = streamer
+        self.cancel = cancel
+        self.params = params
+        self.key = tuple(sorted(params.items()))
+        self.future = Future()
+
+
+class BatchScheduler:
+    """Collect concurrent generation requests into batched model calls.
+
+    Requests are grouped by their generation parameters; a batch is dispatched
+    once it holds ``max_batch_size`` prompts or the oldest request has waited
+    ``max_wait_ms``. ``generate_fn(prompts, deadlines=..., streamers=...,
+    cancels=..., **params)`` must return one result per prompt, in order.
+    Deadlines, streamers and cancel events are per request, so they do not
+    split batches: a streaming request shares its decode with the others.
+    """
+
+    def __init__(self, generate_fn, max_batch_size=8, max_wait_ms=5):
+        self.generate_fn = generate_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._held = []  # requests waiting for a batch with matching params
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, prompt, deadline=None, streamer=None, cancel=None, **params):
+        """Queue a prompt and return a Future for its completion.
+
+        ``streamer`` (a transformers streamer) receives the request's tokens as
+        they are decoded and is always ended, even if the batch fails. Setting
+        the ``cancel`` threading.Event stops the request's row early.
+        """
+        self._ensure_worker()
+        request = _Request(prompt, deadline, streamer, cancel, params)
+        self._queue.put(request)
+        return request.future
+
+    def queue_depth(self):
+        """Number of requests waiting for a batch slot"""
+        return self._queue.qsize() + len(self._held)
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="codellm-batcher", daemon=True)
+                self._worker.start()
+
+    def _next_batch(self):
+        first = self._held.pop(0) if self._held else self._queue.get()
+        batch = [first]
+
+        # Held-back requests that match this batch go first, in arrival order
+        for request in list(self._held):
+            if len(batch) >= self.max_batch_size:
+                break
+            if request.key == first.key:
+                self._held.remove(request)
+                batch.append(request)
+
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request.key == first.key:
+                batch.append(request)
+            else:
+                self._held.append(request)
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                results = self.generate_fn(
+                    [r.prompt for r in batch],
+                    deadlines=[r.deadline for r in batch],
+                    streamers=[r.streamer for r in batch],
+                    cancels=[r.cancel for r in batch],
+                    **batch[0].params
+                )
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                self._end_streams(batch)
+                continue
+
+            for request, result in zip(batch, results):
+                request.future.set_result(result)
+            self._end_streams(batch)
+
+    def _end_streams(self, batch):
+        # After the futures are set, so a stream that ends can tell success from failure
+        for request in batch:
+            if request.streamer is not None:
+                request.streamer.end()
@@ -1,85 +1,596 @@
 from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
 from transformers import RobertaTokenizer, RobertaForSequenceClassification
+from transformers import StoppingCriteriaList, TextIteratorStreamer
+import threading
+import time
+from concurrent.futures import Future
 import torch
-from config import CODE_MODEL_NAME
+from config import CODE_MODEL_NAME, ANALYSIS_MODEL_NAME, ENABLE_REQUEST_BATCHING, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS
+from config import ENABLE_PREFIX_CACHE, PREFIX_CACHE_MAX_MB, PREFIX_CACHE_MIN_TOKENS
+from config import SCORING_BATCH_SIZE, SCORING_CHUNK_SIZE, SCORING_WINDOW_STRIDE
+from config import DETERMINISTIC_GENERATION, RESULT_CACHE_DIR, RESULT_CACHE_MEMORY_ENTRIES, RESULT_CACHE_MAX_MB
+from config import QUANTIZE_INT8, QUANTIZED_MODEL_DIR
+from config import SPECULATIVE_DECODING, SPECULATIVE_DRAFTER, DRAFT_MODEL_NAME
+from config import SPECULATIVE_NUM_TOKENS, PROMPT_LOOKUP_MAX_NGRAM
+from config import CODE_MODEL_CONTEXT, WRITE_MAX_NEW_TOKENS, DEBUG_MAX_NEW_TOKENS, EXPLAIN_MAX_NEW_TOKENS
+from llm.batching import BatchScheduler
+from llm.prefix_cache import PrefixCache
+from llm.stopping import CancelCriteria, CompletionStopCriteria, DeadlineExceeded, deadline_passed, find_stop
+from llm.registry import register_model, get_model
+from llm.metrics import timed, register_gauge, watch_cache, STAGE_SECONDS, TOKENS_GENERATED
+from llm.result_cache import ResultCache
+from llm.quantization import load_quantized
+from llm.speculative import PromptLookupDrafter, DraftModelDrafter, SpeculativeStats, speculative_generate
 
-class CodeLLM:
-    def __init__(self):
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.load_models()
-        
-    def load_models(self):
-        """Load code generation and analysis models"""
-        # Code generation model
-        self.code_tokenizer = AutoTokenizer.from_pretrained(CODE_MODEL_NAME)
-        self.code_model = AutoModelForCausalLM.from_pretrained(
-            CODE_MODEL_NAME, 
+# Debug budgets are rounded up to a multiple of this many tokens
+DEBUG_BUDGET_STEP = 128
+
+# Fixed headers of the built-in prompt templates; their KV state is cached
+DEBUG_PROMPT_PREFIX = "# Debug this code:\n# Error:"
+EXPLAIN_PROMPT_PREFIX = "# Explain this code:"
+
+def _window_starts(length, window, stride):
+    """Start offsets of windows covering a sequence, the last one flush with its end"""
+    if length <= window:
+        return [0]
+    starts = list(range(0, length - window, stride))
+    starts.append(length - window)
+    return starts
+
+class _RowStreamers:
+    """Fan the tokens of a batched generate call out to one streamer per row.
+
+    A row's streamer ends as soon as that row does (end of sequence or its
+    budget), so a stream does not wait for the rest of its batch. Rows
+    without a streamer are skipped.
+    """
+    
+    def __init__(self, streamers, budgets, stop_token_ids):
+        self.streamers = streamers
+        self.remaining = list(budgets)
+        self.stop_token_ids = set(stop_token_ids)
+        self.prompt_seen = False
+    
+    def put(self, value):
+        if not self.prompt_seen:
+            # generate puts the prompts first; streamers made with skip_prompt drop them
+            self.prompt_seen = True
+            for i, streamer in enumerate(self.streamers):
+                if streamer is not None:
+                    streamer.put(value[i:i + 1])
+            return
+        for i, token in enumerate(value.tolist()):
+            streamer = self.streamers[i]
+            if streamer is None or self.remaining[i] <= 0:
+                continue
+            # Rows that stopped are padded until the whole batch is done
+            if token in self.stop_token_ids:
+                self.remaining[i] = 0
+            else:
+                streamer.put(torch.tensor([token]))
+                self.remaining[i] -= 1
+            if self.remaining[i] <= 0:
+                streamer.end()
+    
+    def end(self):
+        for i, streamer in enumerate(self.streamers):
+            if streamer is not None and self.remaining[i] > 0:
+                self.remaining[i] = 0
+                streamer.end()
+
+def _quantize():
+    # Dynamic int8 kernels are CPU-only; GPUs keep float16
+    return QUANTIZE_INT8 and not torch.cuda.is_available()
+
+def load_code_model(model_name=CODE_MODEL_NAME):
+    """Load a code generation model and its tokenizer"""
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    if _quantize():
+        model = load_quantized(
+            model_name,
+            lambda: AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch.float32),
+            QUANTIZED_MODEL_DIR
+        )
+    else:
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name, 
             device_map="auto",
             torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
         )
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = "left"  # Batched decoding needs prompts flush right
+    return tokenizer, model
+
+def load_analysis_model(model_name=ANALYSIS_MODEL_NAME):
+    """Load a code analysis model (CodeBERT) and its tokenizer"""
+    tokenizer = RobertaTokenizer.from_pretrained(model_name)
+    load = lambda: RobertaForSequenceClassification.from_pretrained(
+        model_name,
+        num_labels=2  # For bug detection
+    )
+    model = load_quantized(model_name, load, QUANTIZED_MODEL_DIR) if _quantize() else load()
+    return tokenizer, model
+
+def _load_draft_model():
+    """Load the small model that drafts tokens for speculative decoding"""
+    model = AutoModelForCausalLM.from_pretrained(
+        DRAFT_MODEL_NAME,
+        device_map="auto",
+        torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
+    )
+    return model.eval()
+
+# Weights load on first use and are shared by every CodeLLM in the process
+register_model("codegen", load_code_model)
+register_model("codebert", load_analysis_model)
+if DRAFT_MODEL_NAME:
+    register_model("draft_model", _load_draft_model)
+
+# Caught at startup rather than on the first request that drafts
+if SPECULATIVE_DECODING:
+    if SPECULATIVE_DRAFTER not in ("prompt_lookup", "draft_model"):
+        raise ValueError(f'unknown SPECULATIVE_DRAFTER {SPECULATIVE_DRAFTER!r}; use "prompt_lookup" or "draft_model"')
+    if SPECULATIVE_DRAFTER == "draft_model" and not DRAFT_MODEL_NAME:
+        raise ValueError('SPECULATIVE_DRAFTER = "draft_model" needs DRAFT_MODEL_NAME set in config.py')
+
+class CodeLLM:
+    def __init__(self, code_model="codegen", analysis_model="codebert"):
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
         
-        # Code analysis model (CodeBERT)
-        self.analysis_tokenizer = RobertaTokenizer.from_pretrained("microsoft/codebert-base")
-        self.analysis_model = RobertaForSequenceClassification.from_pretrained(
-            "microsoft/codebert-base",
-            num_labels=2  # For bug detection
-        )
+        # Registry names of the models to use (see llm.registry)
+        self.code_model_key = code_model
+        self.analysis_model_key = analysis_model
         
-    def generate_code(self, prompt, max_length=512, temperature=0.7):
-        """Generate code based on prompt"""
-        inputs = self.code_tokenizer.encode(prompt, return_tensors="pt")
-        
-        with torch.no_grad():
-            outputs = self.code_model.generate(
-                inputs,
-                max_length=max_length,
-                temperature=temperature,
-                do_sample=True,
-                pad_token_id=self.code_tokenizer.eos_token_id
+        # Deterministic mode decodes greedily, so results can be cached by their inputs
+        self.do_sample = not DETERMINISTIC_GENERATION
+        
+        # Speculative decoding is exact only for greedy decoding, and runs one sequence at a time
+        self.speculative_stats = None
+        if SPECULATIVE_DECODING and not self.do_sample:
+            self.speculative_stats = SpeculativeStats()
+        
+        # Concurrent generate_code calls are coalesced into batched generate runs
+        self.scheduler = None
+        if ENABLE_REQUEST_BATCHING and self.speculative_stats is None:
+            self.scheduler = BatchScheduler(
+                self._generate_batch,
+                max_batch_size=BATCH_MAX_SIZE,
+                max_wait_ms=BATCH_MAX_WAIT_MS
+            )
+        
+        # Single-prompt decodes resume from the cached state of a shared prefix
+        self.prefix_cache = None
+        self._pending_prefixes = []
+        # generate_code runs on the batcher, streaming and API threads at once
+        self._prefix_lock = threading.Lock()
+        if ENABLE_PREFIX_CACHE:
+            self.prefix_cache = PrefixCache(
+                max_bytes=PREFIX_CACHE_MAX_MB * 1024 * 1024,
+                min_tokens=PREFIX_CACHE_MIN_TOKENS
+            )
+            self.register_prompt_prefix(DEBUG_PROMPT_PREFIX)
+            self.register_prompt_prefix(EXPLAIN_PROMPT_PREFIX)
+        
+        self.result_cache = None
+        if DETERMINISTIC_GENERATION:
+            self.result_cache = ResultCache(
+                RESULT_CACHE_DIR,
+                max_memory_entries=RESULT_CACHE_MEMORY_ENTRIES,
+                max_disk_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024
             )
-            
-        generated_code = self.code_tokenizer.decode(outputs[0], skip_special_tokens=True)
-        return generated_code[len(prompt):].strip()
+        
+        # Read when /metrics is scraped
+        if self.scheduler is not None:
+            register_gauge("assistant_queue_depth", "Requests waiting", self.scheduler.queue_depth, queue="generate")
+        if self.prefix_cache is not None:
+            watch_cache("prefix", self.prefix_cache.stats)
+        if self.result_cache is not None:
+            watch_cache("result", self.result_cache.stats)
+        if self.speculative_stats is not None:
+            register_gauge("assistant_speculative_acceptance_rate", "Fraction of drafted tokens accepted",
+                           lambda: self.speculative_stats.stats()["acceptance_rate"])
+    
+    @property
+    def code_tokenizer(self):
+        return get_model(self.code_model_key)[0]
+    
+    @property
+    def code_model(self):
+        return get_model(self.code_model_key)[1]
+    
+    @property
+    def analysis_tokenizer(self):
+        return get_model(self.analysis_model_key)[0]
+    
+    @property
+    def analysis_model(self):
+        return get_model(self.analysis_model_key)[1]
+        
+    def load_models(self):
+        """Load code generation and analysis models now instead of on first use"""
+        get_model(self.code_model_key)
+        get_model(self.analysis_model_key)
+        
+    def register_prompt_prefix(self, prefix):
+        """Keep the KV state of a fixed prompt header cached once it is seen"""
+        if self.prefix_cache is not None:
+            # Tokenized on first lookup so registering does not load the tokenizer
+            with self._prefix_lock:
+                self._pending_prefixes.append(prefix)
+    
+    def _lookup_prefix(self, prompt_ids):
+        # Pinning and lookup happen together, so no caller looks up before every prefix is pinned
+        with self._prefix_lock:
+            while self._pending_prefixes:
+                prefix = self._pending_prefixes.pop()
+                self.prefix_cache.pin(self.code_tokenizer(prefix)["input_ids"])
+            return self.prefix_cache.lookup(prompt_ids)
+    
+    def generate_code(self, prompt, max_new_tokens=WRITE_MAX_NEW_TOKENS, temperature=0.7, stop_mode="code",
+                      deadline=None):
+        """Generate code based on prompt.
+        
+        Decoding ends after max_new_tokens or at the first stop condition of
+        stop_mode ("code", "script" or "text", see llm.stopping.find_stop). With a
+        deadline (a time.monotonic() value), decoding also stops there and
+        DeadlineExceeded is raised instead of returning partial code.
+        """
+        if self.result_cache is not None:
+            key = self._generation_key(prompt, max_new_tokens, stop_mode)
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return cached
+        
+        params = {"max_new_tokens": max_new_tokens, "temperature": temperature, "stop_mode": stop_mode}
+        if self.scheduler is not None:
+            generated_code = self.scheduler.submit(prompt, deadline=deadline, **params).result()
+        else:
+            generated_code = self._generate_batch([prompt], deadlines=[deadline], **params)[0]
+        if deadline_passed(deadline):
+            raise DeadlineExceeded("generation did not finish before the request deadline")
+        
+        if self.result_cache is not None:
+            self.result_cache.put(key, generated_code)
+        return generated_code
+    
+    def _drafter(self):
+        if SPECULATIVE_DRAFTER == "draft_model":
+            return DraftModelDrafter(get_model("draft_model"), SPECULATIVE_NUM_TOKENS)
+        return PromptLookupDrafter(SPECULATIVE_NUM_TOKENS, PROMPT_LOOKUP_MAX_NGRAM)
+    
+    def _generation_key(self, prompt, max_new_tokens, stop_mode):
+        # Greedy decoding ignores temperature, so it is not part of the key
+        return ResultCache.make_key(CODE_MODEL_NAME, self.code_model_key, "generate", prompt, {
+            "max_new_tokens": max_new_tokens,
+            "stop_mode": stop_mode,
+            "do_sample": False,
+            "int8": _quantize()
+        })
+    
+    def _budgets(self, prompt_lengths, max_new_tokens):
+        # Long prompts get fewer new tokens rather than overflowing the context window
+        return [max(min(max_new_tokens, CODE_MODEL_CONTEXT - length), 0) for length in prompt_lengths]
+    
+    def _generate_batch(self, prompts, max_new_tokens=WRITE_MAX_NEW_TOKENS, temperature=0.7, stop_mode="code",
+                        deadlines=None, streamers=None, cancels=None):
+        """Generate code for several prompts in one left-padded generate call.
+        
+        ``streamers`` and ``cancels`` optionally hold a streamer and a
+        threading.Event per prompt (see BatchScheduler.submit).
+        """
+        with timed("tokenize"):
+            inputs = self.code_tokenizer(prompts, return_tensors="pt", padding=True).to(self.code_model.device)
+        budgets = self._budgets(inputs["attention_mask"].sum(dim=1).tolist(), max_new_tokens)
+        if 0 in budgets:
+            # Prompts that fill the context window get an empty answer and stay out of the batch
+            active = [i for i, budget in enumerate(budgets) if budget > 0]
+            results = ["" for _ in prompts]
+            if active:
+                pick = lambda values: None if values is None else [values[i] for i in active]
+                generated = self._generate_batch(pick(prompts), max_new_tokens, temperature, stop_mode,
+                                                 pick(deadlines), pick(streamers), pick(cancels))
+                for i, generated_code in zip(active, generated):
+                    results[i] = generated_code
+            return results
+        
+        # Every row is padded to the longest prompt, and the batch as a whole must fit the context
+        start = inputs["input_ids"].shape[1]
+        budgets = [min(budget, CODE_MODEL_CONTEXT - start) for budget in budgets]
+        
+        # Rows stop independently, at their budget, deadline or a stop condition
+        stopping_criteria = StoppingCriteriaList([
+            CompletionStopCriteria(self.code_tokenizer, start, budgets, stop_mode, deadlines, cancels)
+        ])
+        row_streamers = None
+        if streamers is not None and any(streamer is not None for streamer in streamers):
+            tokenizer = self.code_tokenizer
+            row_streamers = _RowStreamers(streamers, budgets, {tokenizer.eos_token_id, tokenizer.pad_token_id})
+        
+        # Left padding shifts positions per row, so only unbatched calls use the prefix cache
+        prompt_ids = None
+        past_key_values = None
+        if self.prefix_cache is not None and len(prompts) == 1:
+            prompt_ids = inputs["input_ids"][0].tolist()
+            past_key_values = self._lookup_prefix(prompt_ids)
+        
+        with timed("generate"):
+            if self.speculative_stats is not None and len(prompts) == 1:
+                new_tokens, past = speculative_generate(
+                    self.code_model,
+                    inputs["input_ids"],
+                    budgets[0],
+                    self._drafter(),
+                    eos_token_id=self.code_tokenizer.eos_token_id,
+                    past_key_values=past_key_values,
+                    stopping_criteria=stopping_criteria,
+                    stats=self.speculative_stats
+                )
+                sequences = [inputs["input_ids"][0].tolist() + new_tokens]
+            else:
+                with torch.no_grad():
+                    outputs = self.code_model.generate(
+                        **inputs,
+                        past_key_values=past_key_values,
+                        max_new_tokens=max(budgets),
+                        temperature=temperature if self.do_sample else None,
+                        do_sample=self.do_sample,
+                        pad_token_id=self.code_tokenizer.pad_token_id,
+                        streamer=row_streamers,
+                        stopping_criteria=stopping_criteria,
+                        return_dict_in_generate=True
+                    )
+                sequences, past = outputs.sequences, outputs.past_key_values
+        
+        if prompt_ids is not None and past is not None:
+            self.prefix_cache.put(prompt_ids, past)
+        
+        # Only the new tokens are decoded, then cut where decoding was told to stop
+        results = []
+        with timed("decode"):
+            for row, budget in zip(sequences, budgets):
+                new_tokens = torch.as_tensor(row[start:start + budget])
+                # Rows that stopped early are padded to the longest one
+                TOKENS_GENERATED.observe(int(new_tokens.ne(self.code_tokenizer.pad_token_id).sum()), mode=stop_mode)
+                generated_code = self.code_tokenizer.decode(new_tokens, skip_special_tokens=True)
+                results.append(generated_code[:find_stop(generated_code, stop_mode)].strip())
+        return results
+    
+    def generate_code_stream(self, prompt, max_new_tokens=WRITE_MAX_NEW_TOKENS, temperature=0.7, stop_mode="code",
+                             deadline=None):
+        """Generate code based on prompt, yielding text pieces as they are decoded.
+        
+        With request batching, the prompt goes through the BatchScheduler like
+        generate_code, so concurrent streams share one batched decode.
+        Closing the generator early stops the decode of this prompt.
+        Past the deadline, if any, the decode stops and DeadlineExceeded is raised.
+        """
+        if self.result_cache is not None:
+            key = self._generation_key(prompt, max_new_tokens, stop_mode)
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                if cached:
+                    yield cached
+                return
+        
+        started = time.perf_counter()
+        streamer = TextIteratorStreamer(self.code_tokenizer, skip_prompt=True, skip_special_tokens=True)
+        cancelled = threading.Event()
+        params = {"max_new_tokens": max_new_tokens, "temperature": temperature, "stop_mode": stop_mode}
+        if self.scheduler is not None:
+            future = self.scheduler.submit(prompt, deadline=deadline, streamer=streamer, cancel=cancelled, **params)
+        else:
+            future = self._start_stream(prompt, deadline, streamer, cancelled, params)
+            if future is None:
+                return
+        
+        generated = ""
+        sent = 0
+        try:
+            for text in streamer:
+                generated += text
+                cut = find_stop(generated, stop_mode)
+                # Match generate_code, which strips leading whitespace and cuts at the stop point
+                visible = generated[:cut].lstrip()
+                if len(visible) > sent:
+                    if not sent:
+                        STAGE_SECONDS.observe(time.perf_counter() - started, stage="first_token")
+                    yield visible[sent:]
+                    sent = len(visible)
+                if cut is not None:
+                    break
+        finally:
+            cancelled.set()
+        
+        # A failed decode ends the stream only after its error is set
+        if future.done() and future.exception() is not None:
+            raise future.exception()
+        if deadline_passed(deadline):
+            raise DeadlineExceeded("generation did not finish before the request deadline")
+        
+        # Only streams that ran to completion are cached
+        if self.result_cache is not None:
+            self.result_cache.put(key, generated[:find_stop(generated, stop_mode)].strip())
+    
+    def _start_stream(self, prompt, deadline, streamer, cancelled, params):
+        """Decode one prompt on its own thread into streamer, for when requests are not batched.
+        
+        Unlike the batched path, this one can use the prefix cache and
+        speculative decoding. Returns a Future, or None if the prompt leaves
+        no room for new tokens.
+        """
+        with timed("tokenize"):
+            inputs = self.code_tokenizer(prompt, return_tensors="pt").to(self.code_model.device)
+        prompt_ids = inputs["input_ids"][0].tolist()
+        budget = self._budgets([len(prompt_ids)], params["max_new_tokens"])[0]
+        if budget == 0:
+            return None
+        stop_mode = params["stop_mode"]
+        
+        past_key_values = None
+        if self.prefix_cache is not None:
+            past_key_values = self._lookup_prefix(prompt_ids)
+        
+        future = Future()
+        
+        def run():
+            try:
+                stopping_criteria = StoppingCriteriaList([
+                    CancelCriteria(cancelled),
+                    CompletionStopCriteria(self.code_tokenizer, len(prompt_ids), [budget], stop_mode, [deadline])
+                ])
+                with timed("generate"):
+                    if self.speculative_stats is not None:
+                        new_tokens, past = speculative_generate(
+                            self.code_model,
+                            inputs["input_ids"],
+                            budget,
+                            self._drafter(),
+                            eos_token_id=self.code_tokenizer.eos_token_id,
+                            past_key_values=past_key_values,
+                            stopping_criteria=stopping_criteria,
+                            streamer=streamer,
+                            stats=self.speculative_stats
+                        )
+                        generated_tokens = len(new_tokens)
+                    else:
+                        with torch.no_grad():
+                            outputs = self.code_model.generate(
+                                **inputs,
+                                past_key_values=past_key_values,
+                                max_new_tokens=budget,
+                                temperature=params["temperature"] if self.do_sample else None,
+                                do_sample=self.do_sample,
+                                pad_token_id=self.code_tokenizer.pad_token_id,
+                                streamer=streamer,
+                                stopping_criteria=stopping_criteria,
+                                return_dict_in_generate=True
+                            )
+                        past = outputs.past_key_values
+                        generated_tokens = outputs.sequences.shape[1] - len(prompt_ids)
+                TOKENS_GENERATED.observe(generated_tokens, mode=stop_mode)
+                if self.prefix_cache is not None and past is not None:
+                    self.prefix_cache.put(prompt_ids, past)
+                future.set_result(None)
+            except Exception as e:
+                future.set_exception(e)
+                streamer.end()
+        
+        threading.Thread(target=run, daemon=True).start()
+        return future
     
     def analyze_code_quality(self, code):
         """Analyze code for potential bugs or issues"""
-        inputs = self.analysis_tokenizer(
-            code, 
-            return_tensors="pt", 
-            truncation=True, 
-            max_length=512
-        )
+        return next(self.analyze_code_quality_batch([code]))
+    
+    def analyze_code_quality_batch(self, snippets, batch_size=SCORING_BATCH_SIZE):
+        """Analyze many snippets, yielding one result per snippet in input order.
         
-        with torch.no_grad():
-            outputs = self.analysis_model(**inputs)
-            probabilities = torch.softmax(outputs.logits, dim=-1)
-            
-        # Return probability of code having bugs
-        return {
-            "bug_probability": probabilities[0][1].item(),
-            "quality_score": probabilities[0][0].item()
-        }
-    
-    def debug_code(self, buggy_code, error_message=""):
+        Snippets are read SCORING_CHUNK_SIZE at a time and their windows are
+        sorted by length so each batch carries little padding.
+        """
+        chunk = []
+        for code in snippets:
+            chunk.append(code)
+            if len(chunk) == SCORING_CHUNK_SIZE:
+                yield from self._score_chunk(chunk, batch_size)
+                chunk = []
+        if chunk:
+            yield from self._score_chunk(chunk, batch_size)
+    
+    def _score_chunk(self, chunk, batch_size):
+        if self.result_cache is None:
+            yield from self._score_snippets(chunk, batch_size)
+            return
+        
+        variant = {"int8": _quantize()}
+        keys = [ResultCache.make_key(ANALYSIS_MODEL_NAME, self.analysis_model_key, "quality", code, variant) for code in chunk]
+        results = [self.result_cache.get(key) for key in keys]
+        misses = [i for i, result in enumerate(results) if result is None]
+        
+        scored = self._score_snippets([chunk[i] for i in misses], batch_size) if misses else []
+        for i, result in zip(misses, scored):
+            results[i] = result
+            self.result_cache.put(keys[i], result)
+        
+        yield from results
+    
+    def _score_snippets(self, chunk, batch_size):
+        tokenizer = self.analysis_tokenizer
+        body_length = 512 - tokenizer.num_special_tokens_to_add()
+        
+        # Long snippets are scored over overlapping windows instead of being truncated
+        windows = []  # (snippet index, input ids)
+        with timed("score_tokenize"):
+            for index, ids in enumerate(tokenizer(chunk, add_special_tokens=False)["input_ids"]):
+                for start in _window_starts(len(ids), body_length, SCORING_WINDOW_STRIDE):
+                    windows.append((index, tokenizer.build_inputs_with_special_tokens(ids[start:start + body_length])))
+        
+        order = sorted(range(len(windows)), key=lambda w: len(windows[w][1]))
+        totals = [[0.0, 0.0] for _ in chunk]
+        counts = [0 for _ in chunk]
+        
+        with timed("score"), torch.inference_mode():
+            for batch_start in range(0, len(order), batch_size):
+                batch = order[batch_start:batch_start + batch_size]
+                inputs = tokenizer.pad(
+                    {"input_ids": [windows[w][1] for w in batch]},
+                    return_tensors="pt"
+                ).to(self.analysis_model.device)
+                probabilities = torch.softmax(self.analysis_model(**inputs).logits, dim=-1).tolist()
+                
+                for w, (quality, bug) in zip(batch, probabilities):
+                    index = windows[w][0]
+                    totals[index][0] += quality
+                    totals[index][1] += bug
+                    counts[index] += 1
+        
+        # Return probability of code having bugs, averaged over windows
+        for (quality, bug), count in zip(totals, counts):
+            yield {
+                "bug_probability": bug / count,
+                "quality_score": quality / count
+            }
+    
+    def debug_code(self, buggy_code, error_message="", deadline=None):
         """Suggest fixes for buggy code"""
-        debug_prompt = f"""# Debug this code:
-# Error: {error_message}
+        fixed_code = self.generate_code(self._debug_prompt(buggy_code, error_message), self._debug_budget(buggy_code),
+                                        stop_mode="script", deadline=deadline)
+        return fixed_code
+    
+    def debug_code_stream(self, buggy_code, error_message="", deadline=None):
+        """Suggest fixes for buggy code, yielding text as it is decoded"""
+        yield from self.generate_code_stream(self._debug_prompt(buggy_code, error_message),
+                                             self._debug_budget(buggy_code), stop_mode="script", deadline=deadline)
+    
+    def _debug_budget(self, buggy_code):
+        # The fix repeats the whole input, so the budget grows with it. Rounded up so
+        # requests of similar length share generation parameters and batch together.
+        budget = len(self.code_tokenizer(buggy_code)["input_ids"]) + DEBUG_MAX_NEW_TOKENS
+        return -(-budget // DEBUG_BUDGET_STEP) * DEBUG_BUDGET_STEP
+    
+    def explain_code(self, code, deadline=None):
+        """Generate explanation for code"""
+        explanation = self.generate_code(self._explain_prompt(code), EXPLAIN_MAX_NEW_TOKENS, stop_mode="text",
+                                         deadline=deadline)
+        return explanation
+    
+    def explain_code_stream(self, code, deadline=None):
+        """Generate explanation for code, yielding text as it is decoded"""
+        yield from self.generate_code_stream(self._explain_prompt(code), EXPLAIN_MAX_NEW_TOKENS, stop_mode="text",
+                                             deadline=deadline)
+    
+    def _debug_prompt(self, buggy_code, error_message):
+        return f"""{DEBUG_PROMPT_PREFIX} {error_message}
 # Buggy code:
 {buggy_code}
 
 # Fixed code:
 """
-        
-        fixed_code = self.generate_code(debug_prompt, max_length=1024)
-        return fixed_code
     
-    def explain_code(self, code):
-        """Generate explanation for code"""
-        explain_prompt = f"""# Explain this code:
+    def _explain_prompt(self, code):
+        return f"""{EXPLAIN_PROMPT_PREFIX}
 {code}
 
 # Explanation:
 """
-        
-        explanation = self.generate_code(explain_prompt, max_length=512)
-        return explanation
\ No newline at end of file
@@ -0,0 +1,264 @@
+import bisect
+import json
+import threading
+import time
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import METRICS_ENABLED
+from llm.registry import model_status
+
+# Process-wide metrics, exported in the Prometheus text format by render().
+# Histograms and counters are updated in place by the code they measure;
+# gauges are functions read only when the metrics are scraped, so queue
+# depths and cache statistics cost nothing between scrapes.
+_metrics = {}
+_gauges = {}
+_caches = {}
+_registry_lock = threading.Lock()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (1, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def time(self, **labels):
+        """Context manager and decorator that observes the elapsed seconds"""
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = sorted((key, list(counts)) for key, counts in self._values.items())
+        for key, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                labels = _labels(self.labelnames, key, [("le", bound)])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {counts[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+    def __call__(self, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Timer(self.histogram, self.labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __call__(self, func):
+        return func
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def _register(metric):
+    with _registry_lock:
+        # Modules imported twice (or two instances) share one metric per name
+        return _metrics.setdefault(metric.name, metric)
+
+
+def counter(name, help_text, labelnames=()):
+    return _register(Counter(name, help_text, labelnames))
+
+
+def histogram(name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+    return _register(Histogram(name, help_text, labelnames, buckets))
+
+
+def register_gauge(name, help_text, read, **labels):
+    """Export read() as a gauge sample, called at scrape time.
+
+    Several samples of one gauge are registered with different labels;
+    registering the same name and labels again replaces the function.
+    """
+    with _registry_lock:
+        series = _gauges.setdefault(name, (help_text, {}))[1]
+        series[tuple(sorted(labels.items()))] = read
+
+
+STAGE_SECONDS = histogram(
+    "assistant_stage_seconds",
+    "Time spent in each stage of a request",
+    ("stage",)
+)
+TOKENS_GENERATED = histogram(
+    "assistant_generated_tokens",
+    "New tokens per generated completion",
+    ("mode",),
+    buckets=TOKEN_BUCKETS
+)
+REQUESTS = counter(
+    "assistant_requests_total",
+    "Requests handled, by endpoint and outcome",
+    ("endpoint", "outcome")
+)
+
+
+def timed(stage):
+    """Time a block or function as a stage of STAGE_SECONDS; a no-op when metrics are off"""
+    if not METRICS_ENABLED:
+        return _NULL_TIMER
+    return _Timer(STAGE_SECONDS, {"stage": stage})
+
+
+def watch_cache(name, stats):
+    """Export hits, misses and hit rate of a cache whose stats() returns hits and misses"""
+    with _registry_lock:
+        _caches[name] = stats
+
+
+def _cache_stats():
+    rows = {}
+    for name, stats in list(_caches.items()):
+        try:
+            values = stats()
+        except Exception:
+            continue
+        hits = values.get("hits", values.get("memory_hits", 0) + values.get("disk_hits", 0))
+        misses = values.get("misses", 0)
+        rows[name] = (hits, misses, hits / (hits + misses) if hits + misses else 0.0)
+    return rows
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    with _registry_lock:
+        metrics = list(_metrics.values())
+        gauges = [(name, help_text, list(series.items())) for name, (help_text, series) in _gauges.items()]
+    for metric in metrics:
+        lines.extend(metric.render())
+
+    for name, help_text, series in gauges:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, read in sorted(series, key=lambda item: item[0]):
+            try:
+                value = read()
+            except Exception:
+                continue  # e.g. a component that failed to start; the rest still export
+            lines.append(f"{name}{_labels([k for k, _ in labels], [v for _, v in labels])} {value}")
+
+    caches = _cache_stats()
+    for index, (name, help_text, kind) in enumerate((
+        ("assistant_cache_hits_total", "Cache lookups that hit", "counter"),
+        ("assistant_cache_misses_total", "Cache lookups that missed", "counter"),
+        ("assistant_cache_hit_ratio", "Fraction of cache lookups that hit", "gauge"),
+    )):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for cache, row in sorted(caches.items()):
+            lines.append(f"{name}{_labels(('cache',), (cache,))} {row[index]}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/metrics" and METRICS_ENABLED:
+            self._send(render(), "text/plain; version=0.0.4")
+        elif path == "/health":
+            # Answers while weights are still loading; "models" reports their load state
+            self._send(json.dumps({"status": "ok", "models": model_status()}), "application/json")
+        else:
+            self.send_error(404)
+
+    def _send(self, text, content_type):
+        body = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood the console
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """Serve /health, and /metrics when enabled, on a background thread.
+
+    For processes whose web app (such as the Gradio UI) cannot serve them itself.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -0,0 +1,117 @@
+import threading
+from collections import OrderedDict
+
+
+def _layers(past):
+    """Per-layer (key, value) tensors for both Cache objects and legacy tuples"""
+    if hasattr(past, "to_legacy_cache"):
+        return past.to_legacy_cache()
+    return past
+
+
+def _nbytes(past):
+    return sum(t.numel() * t.element_size() for layer in _layers(past) for t in layer)
+
+
+def _crop(past, length):
+    """Copy of past_key_values trimmed to the first ``length`` positions"""
+    # Clone the slices so a cropped entry does not pin the full-length tensors
+    layers = tuple(tuple(t[:, :, :length, :].clone() for t in layer) for layer in _layers(past))
+    if hasattr(past, "from_legacy_cache"):
+        return type(past).from_legacy_cache(layers)
+    return layers
+
+
+def _common_prefix(a, b):
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class PrefixCache:
+    """LRU cache of past_key_values keyed by prompt token ids.
+
+    A lookup returns the state for the longest prefix (of at least
+    ``min_tokens``) the prompt shares with a recently seen prompt, cropped to
+    that length. Pinned template prefixes are kept outside the LRU so the
+    fixed prompt headers are never evicted, however short they are.
+    """
+
+    def __init__(self, max_bytes, min_tokens=8):
+        self.max_bytes = max_bytes
+        self.min_tokens = min_tokens
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # token id tuple -> (past_key_values, nbytes)
+        self._pinned = {}  # template token id tuple -> past_key_values or None until seen
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def pin(self, token_ids):
+        """Keep the state for this template prefix once a prompt using it is seen"""
+        with self._lock:
+            self._pinned.setdefault(tuple(token_ids), None)
+
+    def lookup(self, token_ids):
+        """Return past_key_values for the longest cached prefix of token_ids, or None"""
+        token_ids = tuple(token_ids)
+        # At least one prompt token must be left to run through the model
+        limit = len(token_ids) - 1
+
+        with self._lock:
+            best_len, best_past, best_key = 0, None, None
+            for key, past in self._pinned.items():
+                if past is not None and best_len < len(key) <= limit and token_ids[:len(key)] == key:
+                    best_len, best_past, best_key = len(key), past, None
+            for key, (past, _) in self._entries.items():
+                length = min(_common_prefix(key, token_ids), limit)
+                if length > best_len and length >= self.min_tokens:
+                    best_len, best_past, best_key = length, past, key
+
+            if best_past is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            if best_key is not None:
+                self._entries.move_to_end(best_key)
+            return _crop(best_past, best_len)
+
+    def put(self, token_ids, past):
+        """Store the state for a prompt; ``past`` may extend past the prompt"""
+        token_ids = tuple(token_ids)
+        if len(token_ids) < self.min_tokens:
+            return
+
+        with self._lock:
+            for key, pinned in self._pinned.items():
+                if pinned is None and len(key) <= len(token_ids) and token_ids[:len(key)] == key:
+                    self._pinned[key] = _crop(past, len(key))
+
+            if token_ids in self._entries:
+                self._entries.move_to_end(token_ids)
+                return
+
+            entry = _crop(past, len(token_ids))
+            size = _nbytes(entry)
+            if size > self.max_bytes:
+                return
+
+            self._entries[token_ids] = (entry, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
@@ -0,0 +1,40 @@
+import os
+from pathlib import Path
+
+import torch
+import transformers
+
+
+def quantize_int8(model):
+    """Dynamic int8 quantization of every nn.Linear; activations stay float32.
+
+    Weights are stored as int8 and dequantized per matmul, which cuts the
+    memory traffic of each CPU decode step roughly by four for those layers.
+    """
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_quantized(model_name, load_fp32, cache_dir):
+    """Int8 version of a model, converted once and then loaded from cache_dir.
+
+    The cache file is a pickled module, so it is keyed by the torch and
+    transformers versions that wrote it, and only files this function wrote
+    should ever be placed in cache_dir.
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    slug = model_name.replace("/", "--")
+    path = cache_dir / f"{slug}-int8-torch{torch.__version__}-tf{transformers.__version__}.pt"
+
+    if path.exists():
+        try:
+            return torch.load(path, weights_only=False)
+        except Exception as e:
+            print(f"Ignoring unreadable quantized model cache {path}: {e}")
+
+    model = quantize_int8(load_fp32())
+    tmp_path = path.with_suffix(".tmp")
+    torch.save(model, tmp_path)
+    os.replace(tmp_path, path)
+    return model
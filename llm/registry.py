@@ -0,0 +1,67 @@
+import threading
+
+# Process-wide registry of lazily loaded models: each entry is loaded on
+# first use and then shared by every caller in the process.
+_loaders = {}
+_instances = {}
+_locks = {}
+_failed = set()
+_registry_lock = threading.Lock()
+
+
+def register_model(name, loader):
+    """Register a zero-argument loader; nothing is loaded until first use"""
+    with _registry_lock:
+        _loaders[name] = loader
+        _locks.setdefault(name, threading.Lock())
+
+
+def get_model(name):
+    """Return the shared instance for name, loading it on first use"""
+    if name in _instances:
+        return _instances[name]
+
+    with _locks[name]:
+        if name not in _instances:
+            try:
+                _instances[name] = _loaders[name]()
+            except Exception:
+                _failed.add(name)
+                raise
+            _failed.discard(name)
+    return _instances[name]
+
+
+def is_loaded(name):
+    return name in _instances
+
+
+def model_status():
+    """Load state of every registered model, for health checks"""
+    status = {}
+    for name in list(_loaders):
+        if name in _instances:
+            status[name] = "loaded"
+        elif _locks[name].locked():
+            status[name] = "loading"
+        elif name in _failed:
+            status[name] = "failed"
+        else:
+            status[name] = "pending"
+    return status
+
+
+def warm_up(names=None):
+    """Load models on a background thread so the first request does not pay for it"""
+    names = list(names or _loaders)
+
+    def run():
+        for name in names:
+            try:
+                get_model(name)
+            except Exception as e:
+                print(f"Warm-up failed for {name}: {e}")
+
+    thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
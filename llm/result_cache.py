@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+class ResultCache:
+    """Two-tier cache for results of deterministic model calls.
+
+    Recent entries live in an in-memory LRU; every entry is also written to
+    ``cache_dir`` as a small JSON file. The disk tier evicts least recently
+    used files once it grows past ``max_disk_bytes``.
+    """
+
+    def __init__(self, cache_dir, max_memory_entries=1024, max_disk_bytes=512 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Rebuild the disk index oldest-first so eviction order survives restarts
+        files = sorted(self.cache_dir.glob("*/*.json"), key=lambda p: p.stat().st_mtime)
+        self._disk = OrderedDict((p.stem, p.stat().st_size) for p in files)
+        self._disk_bytes = sum(self._disk.values())
+
+    @staticmethod
+    def make_key(*parts):
+        """Stable key for a model name, call kind, input and decoding parameters"""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key):
+        """Return the cached value, or None on a miss"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+
+            if key in self._disk:
+                path = self._path(key)
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        value = json.load(f)
+                    os.utime(path)
+                except (OSError, ValueError):
+                    self._forget(key)
+                else:
+                    self._disk.move_to_end(key)
+                    self._remember(key, value)
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+            if key in self._disk:
+                return
+
+            path = self._path(key)
+            path.parent.mkdir(exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+
+            self._disk[key] = path.stat().st_size
+            self._disk_bytes += self._disk[key]
+            while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+                self._forget(next(iter(self._disk)))
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _forget(self, key):
+        self._disk_bytes -= self._disk.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
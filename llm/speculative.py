@@ -0,0 +1,165 @@
+import threading
+
+import torch
+from transformers import DynamicCache
+
+
+class PromptLookupDrafter:
+    """Propose the tokens that followed the latest earlier occurrence of the current n-gram.
+
+    Costs no model calls. It pays off when the output copies spans of the
+    input, as fixed code does when debugging.
+    """
+
+    def __init__(self, num_tokens=8, max_ngram=3):
+        self.num_tokens = num_tokens
+        self.max_ngram = max_ngram
+
+    def propose(self, tokens, limit):
+        limit = min(limit, self.num_tokens)
+        for n in range(min(self.max_ngram, len(tokens) - 1), 0, -1):
+            ngram = tokens[-n:]
+            # Latest match first: recent context is the best predictor
+            for start in range(len(tokens) - n - 1, -1, -1):
+                if tokens[start:start + n] == ngram:
+                    return tokens[start + n:start + n + limit]
+        return []
+
+
+class DraftModelDrafter:
+    """Propose tokens by greedy decoding with a small model sharing the main tokenizer.
+
+    The draft model keeps its own KV cache for one generation and crops it
+    back to the accepted tokens after each verification.
+    """
+
+    def __init__(self, model, num_tokens=5):
+        self.model = model
+        self.num_tokens = num_tokens
+        self._past = DynamicCache()
+        self._fed = []  # tokens whose state is in _past
+
+    def propose(self, tokens, limit):
+        limit = min(limit, self.num_tokens)
+        if limit <= 0:
+            return []
+
+        # Keep the cached state for the longest prefix still valid, minus the last token
+        common = 0
+        while common < min(len(self._fed), len(tokens) - 1) and self._fed[common] == tokens[common]:
+            common += 1
+        self._past.crop(common)
+        self._fed = tokens[:common]
+
+        drafts = []
+        pending = tokens[common:]
+        device = self.model.device
+        with torch.inference_mode():
+            for _ in range(limit):
+                logits = self.model(
+                    torch.tensor([pending], device=device),
+                    past_key_values=self._past,
+                    use_cache=True
+                ).logits
+                self._fed.extend(pending)
+                token = int(logits[0, -1].argmax())
+                drafts.append(token)
+                pending = [token]
+        return drafts
+
+
+class SpeculativeStats:
+    """Acceptance counters shared by every speculative decode in a process"""
+
+    def __init__(self):
+        self.proposed = 0
+        self.accepted = 0
+        self.verify_steps = 0
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, proposed, accepted, verify_steps, tokens):
+        with self._lock:
+            self.proposed += proposed
+            self.accepted += accepted
+            self.verify_steps += verify_steps
+            self.tokens += tokens
+
+    def stats(self):
+        return {
+            "proposed": self.proposed,
+            "accepted": self.accepted,
+            "acceptance_rate": self.accepted / self.proposed if self.proposed else 0.0,
+            # Tokens produced per forward pass of the main model (1.0 without speculation)
+            "tokens_per_step": self.tokens / self.verify_steps if self.verify_steps else 0.0
+        }
+
+
+def speculative_generate(model, input_ids, max_new_tokens, drafter, eos_token_id=None,
+                         past_key_values=None, stopping_criteria=None, streamer=None, stats=None):
+    """Greedy decoding where drafted tokens are verified in one forward pass.
+
+    Each step takes the main model's next token, asks the drafter for up to
+    ``num_tokens`` more, and runs them all through the main model at once.
+    Drafts are kept while they equal the main model's argmax at their
+    position, so the output is the same as plain greedy decoding. Only a
+    single sequence (batch size 1) is supported.
+
+    Returns (new token ids, past_key_values).
+    """
+    device = model.device
+    tokens = input_ids[0].tolist()
+    prompt_length = len(tokens)
+    if streamer is not None:
+        streamer.put(input_ids.cpu())  # skipped by streamers created with skip_prompt=True
+
+    past = past_key_values if past_key_values is not None else DynamicCache()
+    proposed = accepted = steps = 0
+
+    with torch.inference_mode():
+        cached = past.get_seq_length()
+        logits = model(input_ids[:, cached:].to(device), past_key_values=past, use_cache=True).logits[0, -1]
+        steps += 1
+
+        while True:
+            token = int(logits.argmax())
+            tokens.append(token)
+            new_tokens = [token]
+
+            generated = len(tokens) - prompt_length
+            if token != eos_token_id and generated < max_new_tokens:
+                drafts = drafter.propose(tokens, max_new_tokens - generated)
+                step_logits = model(
+                    torch.tensor([[token] + drafts], device=device),
+                    past_key_values=past,
+                    use_cache=True
+                ).logits[0]
+                steps += 1
+
+                # predicted[i] is the main model's choice after token and drafts[:i]
+                predicted = step_logits.argmax(dim=-1).tolist()
+                n = 0
+                while n < len(drafts) and predicted[n] == drafts[n]:
+                    n += 1
+                    if drafts[n - 1] == eos_token_id:
+                        break
+                proposed += len(drafts)
+                accepted += n
+
+                tokens.extend(drafts[:n])
+                new_tokens.extend(drafts[:n])
+                past.crop(len(tokens))  # drop the state of rejected drafts
+                logits = step_logits[n]
+
+            if streamer is not None:
+                streamer.put(torch.tensor(new_tokens))
+            if new_tokens[-1] == eos_token_id or len(tokens) - prompt_length >= max_new_tokens:
+                break
+            if stopping_criteria and torch.as_tensor(stopping_criteria(torch.tensor([tokens], device=device), None)).all():
+                break
+
+    if streamer is not None:
+        streamer.end()
+    if stats is not None:
+        stats.record(proposed, accepted, steps, len(tokens) - prompt_length)
+    return tokens[prompt_length:], past
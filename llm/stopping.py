@@ -0,0 +1,146 @@
+import time
+
+import torch
+from transformers import StoppingCriteria
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a generation was cut short by its request deadline"""
+
+
+def deadline_passed(deadline):
+    """Whether a time.monotonic() deadline (or None for no deadline) has passed"""
+    return deadline is not None and time.monotonic() >= deadline
+
+
+class CancelCriteria(StoppingCriteria):
+    """Stop every row as soon as the given threading.Event is set"""
+
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+# Ends a completion outright, whatever the task
+STOP_SENTINELS = ("\n\n\n",)
+
+_DEFINITION_STARTS = ("def ", "async def ", "class ", "@")
+
+
+def stop_mode_for(language):
+    """Stop mode for generated code in a language.
+
+    The "code" boundary rules follow Python's comments and indentation; in
+    brace languages a dedent is not the end of a block (``}`` sits at column
+    0), so those only stop at the sentinels.
+    """
+    return "code" if language == "python" else "text"
+
+
+def _open_string(line, quote=None):
+    """Triple quote still open at the end of a line, given the one open at its start.
+
+    Single-line strings and comments are skipped, so quotes inside them do
+    not count.
+    """
+    i = 0
+    while i < len(line):
+        if quote:
+            end = line.find(quote, i)
+            if end == -1:
+                return quote
+            i, quote = end + 3, None
+        elif line.startswith(('"""', "'''"), i):
+            quote = line[i:i + 3]
+            i += 3
+        elif line[i] == "#":
+            return None
+        elif line[i] in "\"'":
+            close = i + 1
+            while close < len(line) and line[close] != line[i]:
+                close += 2 if line[close] == "\\" else 1
+            i = close + 1
+        else:
+            i += 1
+    return quote
+
+
+def find_stop(text, mode="code"):
+    """Offset at which a completion should be cut, or None to keep decoding.
+
+    Every mode stops at a sentinel. In "code" mode the completion also ends
+    where, after some code, a new top-level ``# `` comment block starts (the
+    model moving on to another task), or where a line returns to column 0
+    after a completed function or class body, unless it starts another
+    definition. Lines inside a triple-quoted string are string content and
+    never end the completion. This assumes Python (see stop_mode_for). "script"
+    mode (a whole fixed program, which may hold several top-level functions
+    and statements) and "text" mode (explanations and non-Python code) only
+    use the sentinels.
+    """
+    cut = None
+    for sentinel in STOP_SENTINELS:
+        index = text.find(sentinel)
+        if index != -1 and (cut is None or index < cut):
+            cut = index
+    if mode != "code":
+        return cut
+
+    seen_code = False
+    in_definition = False
+    has_body = False
+    quote = None
+    offset = 0
+    for line in text.split("\n"):
+        if cut is not None and offset >= cut:
+            break
+        if quote is not None:
+            quote = _open_string(line, quote)
+        elif line.strip():
+            top_level = not line[0].isspace()
+            if top_level and line.startswith("# ") and seen_code:
+                return offset
+            if top_level and in_definition and has_body and not line.startswith(_DEFINITION_STARTS):
+                return offset
+            if top_level and line.startswith(_DEFINITION_STARTS):
+                in_definition, has_body = True, False
+            elif not top_level and in_definition:
+                has_body = True
+            if not line.startswith("#"):
+                seen_code = True
+            quote = _open_string(line)
+        offset += len(line) + 1
+    return cut
+
+
+class CompletionStopCriteria(StoppingCriteria):
+    """Stop each row at a task-specific boundary (see find_stop), its own token budget,
+    its own deadline or when it is cancelled.
+
+    Only the tokens after ``prompt_length`` are decoded, so a stop condition
+    inside the prompt never ends the completion. ``deadlines`` holds a
+    time.monotonic() value or None per row, ``cancels`` a threading.Event or
+    None per row.
+    """
+
+    def __init__(self, tokenizer, prompt_length, budgets, mode="code", deadlines=None, cancels=None):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.budgets = budgets
+        self.mode = mode
+        self.deadlines = deadlines or [None] * len(budgets)
+        self.cancels = cancels or [None] * len(budgets)
+
+    def __call__(self, input_ids, scores, **kwargs):
+        done = []
+        for row, budget, deadline, cancel in zip(input_ids, self.budgets, self.deadlines, self.cancels):
+            new_tokens = row[self.prompt_length:]
+            cancelled = cancel is not None and cancel.is_set()
+            if len(new_tokens) >= budget or deadline_passed(deadline) or cancelled:
+                done.append(True)
+                continue
+            text = self.tokenizer.decode(new_tokens, skip_special_tokens=True)
+            done.append(find_stop(text, self.mode) is not None)
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
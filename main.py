@@ -1,27 +1,64 @@
-from code_assistant import create_code_interface
-from collect_training_data import collect_all_data
-from training.train_code_model import CodeModelTrainer
 import argparse
 
+# Heavy imports (torch, transformers, gradio) happen inside the mode that needs them
 def main():
     parser = argparse.ArgumentParser(description="AI Code Assistant")
-    parser.add_argument("--mode", choices=["collect", "train", "serve"], default="serve",
-                       help="Mode: collect data, train model, or serve interface")
+    parser.add_argument("--mode", choices=["collect", "dedup", "tokenize", "train", "index", "serve", "api"],
+                       default="serve",
+                       help="Mode: collect data, deduplicate it, pre-tokenize it, train model, "
+                            "index it for retrieval, serve interface, or serve the JSON API")
+    parser.add_argument("--no-warmup", action="store_true",
+                       help="Serve/API mode: load models on first request instead of in the background")
     
     args = parser.parse_args()
     
     if args.mode == "collect":
+        from collect_training_data import collect_all_data
         print("Collecting training data...")
         collect_all_data()
         
+    elif args.mode == "dedup":
+        from training.dedup import deduplicate_corpus
+        print("Deduplicating training data...")
+        deduplicate_corpus()
+        
+    elif args.mode == "tokenize":
+        from training.pretokenize import pretokenize_corpus
+        print("Tokenizing training data...")
+        pretokenize_corpus()
+        
     elif args.mode == "train":
+        from training.train_code_model import CodeModelTrainer
         print("Training code model...")
         trainer = CodeModelTrainer()
         trainer.train()
         
+    elif args.mode == "index":
+        from rag.indexer import index_corpus
+        print("Indexing training data into the vector store...")
+        index_corpus()
+        
+    elif args.mode == "api":
+        from api import run_api
+        from config import API_HOST, API_PORT
+        from llm.registry import warm_up
+        print(f"Starting JSON API on {API_HOST}:{API_PORT}...")
+        if not args.no_warmup:
+            warm_up(["codegen", "codebert"])
+        run_api(API_HOST, API_PORT)
+        
     else:  # serve
+        from code_assistant import create_code_interface
+        from config import METRICS_ENABLED, METRICS_PORT
+        from llm.metrics import start_metrics_server
+        from llm.registry import warm_up
         print("Starting code assistant interface...")
         interface = create_code_interface()
+        # Gradio cannot serve extra routes, so health checks use the metrics port
+        start_metrics_server(METRICS_PORT)
+        print(f"Serving /health{' and /metrics' if METRICS_ENABLED else ''} on port {METRICS_PORT}")
+        if not args.no_warmup:
+            warm_up(["codegen", "codebert"])
         interface.launch(share=True)
 
 if __name__ == "__main__":
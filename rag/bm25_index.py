@@ -0,0 +1,117 @@
+import json
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+from config import BM25_INDEX_PATH
+from llm.registry import register_model
+
+_WORD_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_PART_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (id TEXT PRIMARY KEY, length INTEGER, content TEXT, metadata TEXT);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT, doc_id TEXT, tf INTEGER, PRIMARY KEY (term, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+"""
+
+
+def tokenize(text):
+    """Lowercased identifiers, plus their camelCase and snake_case parts.
+
+    ``getHTTPResponse_code`` gives the whole identifier and also
+    get, http, response and code, so both exact symbols and their words match.
+    """
+    tokens = []
+    for word in _WORD_RE.findall(text):
+        tokens.append(word.lower())
+        parts = [part.lower() for piece in word.split("_") for part in _PART_RE.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    """Inverted index with BM25 scoring, stored in SQLite next to the Chroma store.
+
+    Documents are added and deleted by id, in the same calls that write the
+    vector store, so the two stay in step without full rebuilds.
+    """
+
+    def __init__(self, path, k1=1.5, b=0.75):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def add(self, ids, texts, metadatas=None):
+        """Insert or replace documents"""
+        metadatas = metadatas or [{}] * len(ids)
+        with self._lock, self._conn:
+            self._delete(ids)
+            for doc_id, text, metadata in zip(ids, texts, metadatas):
+                counts = Counter(tokenize(text))
+                self._conn.execute(
+                    "INSERT INTO docs VALUES (?, ?, ?, ?)",
+                    (doc_id, sum(counts.values()), text, json.dumps(metadata))
+                )
+                self._conn.executemany(
+                    "INSERT INTO postings VALUES (?, ?, ?)",
+                    [(term, doc_id, tf) for term, tf in counts.items()]
+                )
+
+    def delete(self, ids):
+        with self._lock, self._conn:
+            self._delete(ids)
+
+    def _delete(self, ids):
+        rows = [(doc_id,) for doc_id in ids]
+        self._conn.executemany("DELETE FROM postings WHERE doc_id = ?", rows)
+        self._conn.executemany("DELETE FROM docs WHERE id = ?", rows)
+
+    def search(self, query, k=10):
+        """Top-k (id, score) pairs for a query"""
+        terms = set(tokenize(query))
+        with self._lock:
+            total, total_length = self._conn.execute("SELECT COUNT(*), SUM(length) FROM docs").fetchone()
+            if not total or not terms:
+                return []
+            avg_length = total_length / total
+
+            scores = Counter()
+            for term in terms:
+                postings = self._conn.execute(
+                    "SELECT p.doc_id, p.tf, d.length FROM postings p JOIN docs d ON d.id = p.doc_id "
+                    "WHERE p.term = ?", (term,)
+                ).fetchall()
+                if not postings:
+                    continue
+                idf = math.log((total - len(postings) + 0.5) / (len(postings) + 0.5) + 1)
+                for doc_id, tf, length in postings:
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return scores.most_common(k)
+
+    def documents(self, ids):
+        """Stored documents for ids, in the same order (missing ids are skipped)"""
+        with self._lock:
+            rows = {}
+            for doc_id in ids:
+                row = self._conn.execute("SELECT content, metadata FROM docs WHERE id = ?", (doc_id,)).fetchone()
+                if row:
+                    rows[doc_id] = row
+        return [Document(page_content=rows[i][0], metadata=json.loads(rows[i][1])) for i in ids if i in rows]
+
+
+# Shared index for callers that go through llm.registry.get_model
+register_model("bm25_index", lambda: BM25Index(BM25_INDEX_PATH))
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single writing process is assumed
+    fcntl = None
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Layout of one model's cache directory:
+#   meta.json     model name and vector dimension
+#   vectors.f32   float32 vectors, one row per cached text, append-only
+#   keys.bin      16-byte key of each row, in the same order (the sidecar index)
+#   .lock         flock'ed by every process while it appends or trims rows
+_KEY_SIZE = 16
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that never embeds the same text twice.
+
+    Vectors are keyed by a hash of (model name, text) and persisted to an
+    append-only memory-mapped file, so they survive restarts. Misses in a
+    call are deduplicated and embedded with a single model call. The model
+    comes from ``load_model`` and is only loaded on first use. Only document
+    embeddings are cached; ``embed_query`` always calls the model.
+
+    Several processes (the indexer, the updater, the app) may share a cache
+    directory: appends happen under a file lock, and each writer first
+    indexes the rows others appended, so row numbers always match the file.
+    """
+
+    def __init__(self, model_name, load_model, cache_dir):
+        self.model_name = model_name
+        self._load_model = load_model
+        self.cache_dir = Path(cache_dir) / model_name.replace("/", "--")
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.dim = None
+        meta_path = self.cache_dir / "meta.json"
+        if meta_path.exists():
+            with open(meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+
+        self._index = {}
+        self._rows_indexed = 0  # rows of the files covered by _index
+        self._vectors = None
+        if self.dim is not None:
+            with self._file_lock():
+                self._sync()
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self.cache_dir / ".lock", "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _sync(self):
+        """Index rows appended since the last sync; call with the file lock held"""
+        keys_path = self.cache_dir / "keys.bin"
+        vectors_path = self.cache_dir / "vectors.f32"
+        stored_keys = keys_path.stat().st_size // _KEY_SIZE if keys_path.exists() else 0
+        stored = vectors_path.stat().st_size // (self.dim * 4) if vectors_path.exists() else 0
+        rows = min(stored_keys, stored)
+
+        # Drop a partially written tail left by a crash; vectors are written before keys.
+        # Safe under the lock, since no other writer can be mid-append.
+        with open(keys_path, "ab") as f:
+            f.truncate(rows * _KEY_SIZE)
+        with open(vectors_path, "ab") as f:
+            f.truncate(rows * self.dim * 4)
+
+        if rows > self._rows_indexed:
+            with open(keys_path, "rb") as f:
+                f.seek(self._rows_indexed * _KEY_SIZE)
+                keys = f.read((rows - self._rows_indexed) * _KEY_SIZE)
+            for i in range(rows - self._rows_indexed):
+                self._index.setdefault(keys[i * _KEY_SIZE:(i + 1) * _KEY_SIZE], self._rows_indexed + i)
+        self._rows_indexed = rows
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).digest()[:_KEY_SIZE]
+
+    def _rows(self, rows):
+        if self._vectors is None or len(self._vectors) <= max(rows):
+            self._vectors = np.memmap(self.cache_dir / "vectors.f32", dtype=np.float32, mode="r",
+                                      shape=(self._rows_indexed, self.dim))
+        return self._vectors[rows]
+
+    def lookup(self, texts):
+        """Cached vectors for texts, with None for each miss"""
+        with self._lock:
+            rows = [self._index.get(self._key(text)) for text in texts]
+            found = [row for row in rows if row is not None]
+            vectors = iter(self._rows(found)) if found else iter(())
+            return [next(vectors) if row is not None else None for row in rows]
+
+    def store(self, texts, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self.cache_dir / "meta.json", "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model_name, "dim": self.dim}, f)
+
+            with self._file_lock():
+                # Rows other processes appended come first, and may already hold these texts
+                self._sync()
+                new = {}
+                for text, vector in zip(texts, vectors):
+                    key = self._key(text)
+                    if key not in self._index and key not in new:
+                        new[key] = vector
+                if not new:
+                    return
+
+                vectors_path = self.cache_dir / "vectors.f32"
+                first_row = vectors_path.stat().st_size // (self.dim * 4) if vectors_path.exists() else 0
+                with open(vectors_path, "ab") as f:
+                    f.write(np.stack(list(new.values())).tobytes())
+                with open(self.cache_dir / "keys.bin", "ab") as f:
+                    f.write(b"".join(new))
+                for row, key in enumerate(new, first_row):
+                    self._index[key] = row
+                self._rows_indexed = first_row + len(new)
+
+    def embed_documents(self, texts):
+        cached = self.lookup(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+        with self._lock:
+            self.hits += len(texts) - sum(vector is None for vector in cached)
+            self.misses += len(missing)
+
+        if missing:
+            computed = dict(zip(missing, self._load_model().embed_documents(missing)))
+            self.store(missing, [computed[text] for text in missing])
+            cached = [vector if vector is not None else computed[text] for text, vector in zip(texts, cached)]
+
+        return [np.asarray(vector, dtype=np.float32).tolist() for vector in cached]
+
+    def embed_query(self, text):
+        # Queries rarely repeat verbatim (repeat questions are the semantic cache's job),
+        # so they go straight to the shared model instead of growing the cache on disk
+        return np.asarray(self._load_model().embed_query(text), dtype=np.float32).tolist()
+
+    def stats(self):
+        with self._lock:
+            hits, misses, entries = self.hits, self.misses, len(self._index)
+        total = hits + misses
+        return {
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / total if total else 0.0
+        }
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import time
+from collections import deque
+from multiprocessing import Pool
+
+import chromadb
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from config import CHROMA_DB_DIR, EMBEDDING_MODEL_NAME, KB_CHUNK_SIZE, KB_CHUNK_OVERLAP, INDEX_BATCH_SIZE
+from llm.registry import get_model
+from scrape.shards import iter_records
+from training.corpus import corpus_files, record_to_text
+from rag.vectorstore import mark_updated  # also registers "embeddings"
+import rag.bm25_index  # registers "bm25_index"
+
+# Collection used by langchain's Chroma wrapper when no name is given
+COLLECTION_NAME = "langchain"
+
+_worker_model = None
+
+def _init_worker(model_name, threads):
+    global _worker_model
+    import torch
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    torch.set_num_threads(threads)  # the pool already uses every core
+    _worker_model = HuggingFaceEmbeddings(model_name=model_name)
+
+def _embed_batch(texts):
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.asarray(_worker_model.embed_documents(texts), dtype=np.float32)
+
+def _record_metadata(item):
+    if "content" in item:  # GitHub code
+        metadata = {
+            "source": "github",
+            "repo": item.get("repo"),
+            "path": item.get("file_path"),
+            "language": item.get("language"),
+            "score": item.get("stars")
+        }
+    else:  # StackOverflow Q&A
+        metadata = {
+            "source": "stackoverflow",
+            "title": item.get("question_title"),
+            "language": item.get("language"),
+            "score": item.get("answer_score")
+        }
+    # Chroma rejects None metadata values
+    return {key: value for key, value in metadata.items() if value is not None}
+
+def _iter_chunks(files, splitter):
+    """(id, text, metadata) for every chunk of every distinct record"""
+    seen = set()
+    for path in files:
+        for item in iter_records(path):
+            text = record_to_text(item)
+            if not text:
+                continue
+            # Ids come from the content, so re-indexing the same record overwrites it
+            record_id = hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+            if record_id in seen:  # Chroma rejects repeated ids within one upsert
+                continue
+            seen.add(record_id)
+            metadata = _record_metadata(item)
+            for index, chunk in enumerate(splitter.split_text(text)):
+                yield f"{record_id}-{index}", chunk, dict(metadata, chunk=index)
+
+def _misses(batch, cache, pending):
+    cached = cache.lookup([text for _, text, _ in batch])
+    pending.append((batch, cached))
+    return [text for (_, text, _), vector in zip(batch, cached) if vector is None]
+
+def _batches(chunks, cache, size, pending):
+    """Yield the cache misses of each batch; the batch itself waits in `pending`"""
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) == size:
+            yield _misses(batch, cache, pending)
+            batch = []
+    if batch:
+        yield _misses(batch, cache, pending)
+
+def index_corpus(data_dir=None, num_proc=None, batch_size=INDEX_BATCH_SIZE):
+    """Embed the scraped corpus and bulk-upsert it into the RAG vector store.
+
+    Records are streamed from the corpus shards and split into chunks.
+    Chunks found in the embedding cache are taken from it; the rest are
+    embedded on a process pool, one model per worker. Each batch is upserted
+    into the Chroma collection that the QA chain searches, with repo, path,
+    language and score metadata, and added to the BM25 index.
+    """
+    num_proc = num_proc or os.cpu_count()
+    threads = max(1, (os.cpu_count() or 1) // num_proc)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=KB_CHUNK_SIZE, chunk_overlap=KB_CHUNK_OVERLAP)
+    cache = get_model("embeddings")
+    bm25_index = get_model("bm25_index")
+    collection = chromadb.PersistentClient(path=CHROMA_DB_DIR).get_or_create_collection(COLLECTION_NAME)
+
+    files = corpus_files(data_dir)
+    pending = deque()
+    indexed = embedded = 0
+    start = time.perf_counter()
+
+    with Pool(num_proc, initializer=_init_worker, initargs=(EMBEDDING_MODEL_NAME, threads)) as pool:
+        batches = _batches(_iter_chunks(files, splitter), cache, batch_size, pending)
+        for computed in pool.imap(_embed_batch, batches):
+            batch, cached = pending.popleft()
+            missing = [text for (_, text, _), vector in zip(batch, cached) if vector is None]
+            if missing:
+                cache.store(missing, computed)
+            computed = iter(computed)
+            vectors = [vector if vector is not None else next(computed) for vector in cached]
+
+            collection.upsert(
+                ids=[chunk_id for chunk_id, _, _ in batch],
+                embeddings=np.asarray(vectors, dtype=np.float32).tolist(),
+                documents=[text for _, text, _ in batch],
+                metadatas=[metadata for _, _, metadata in batch]
+            )
+            bm25_index.add(
+                [chunk_id for chunk_id, _, _ in batch],
+                [text for _, text, _ in batch],
+                [metadata for _, _, metadata in batch]
+            )
+
+            indexed += len(batch)
+            embedded += len(missing)
+            elapsed = time.perf_counter() - start
+            print(f"Indexed {indexed} chunks ({embedded} embedded, {indexed - embedded} from cache) "
+                  f"- {indexed / elapsed:.0f} chunks/s")
+
+    if indexed:
+        mark_updated()
+    elapsed = time.perf_counter() - start
+    print(f"Indexing completed: {indexed} chunks from {len(files)} files in {elapsed:.1f}s")
+    return {"chunks": indexed, "embedded": embedded, "seconds": elapsed}
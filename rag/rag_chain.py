@@ -1,7 +1,51 @@
+from typing import Any, List
+
 from langchain.chains import RetrievalQA
 from langchain.llms import HuggingFacePipeline
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from config import RETRIEVER_K, HYBRID_CANDIDATES, RRF_K
+from llm.metrics import timed
+
+class HybridRetriever(BaseRetriever):
+    """Fuse BM25 and vector search results with reciprocal rank fusion.
+
+    Each side returns ``candidates`` results; a document scores
+    sum(1 / (rrf_k + rank)) over the lists it appears in, and the top ``k``
+    are returned. Exact identifiers that embeddings miss still rank through
+    the lexical side, so a small k is enough.
+    """
+
+    vectorstore: Any
+    bm25_index: Any
+    k: int = RETRIEVER_K
+    candidates: int = HYBRID_CANDIDATES
+    rrf_k: int = RRF_K
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        with timed("retrieve_vector"):
+            vector_docs = self.vectorstore.similarity_search(query, k=self.candidates)
+        with timed("retrieve_bm25"):
+            lexical_ids = [doc_id for doc_id, _ in self.bm25_index.search(query, self.candidates)]
+            lexical_docs = self.bm25_index.documents(lexical_ids)
+
+        # Both stores hold the same chunks, so the text identifies a document across them
+        scores = {}
+        documents = {}
+        for ranked in (vector_docs, lexical_docs):
+            for rank, doc in enumerate(ranked):
+                key = doc.page_content
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+                documents.setdefault(key, doc)
+
+        best = sorted(scores, key=scores.get, reverse=True)[:self.k]
+        return [documents[key] for key in best]
 
-def create_qa_chain(llm_pipeline, vectorstore):
+def create_qa_chain(llm_pipeline, vectorstore, bm25_index=None):
     llm = HuggingFacePipeline(pipeline=llm_pipeline)
-    retriever = vectorstore.as_retriever()
+    if bm25_index is not None:
+        retriever = HybridRetriever(vectorstore=vectorstore, bm25_index=bm25_index)
+    else:
+        retriever = vectorstore.as_retriever(search_kwargs={"k": RETRIEVER_K})
     return RetrievalQA.from_chain_type(llm=llm, retriever=retriever, return_source_documents=True)
@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticCache:
+    """Answers to recent questions, matched by embedding similarity.
+
+    A query hits when the cosine similarity between its embedding and a
+    cached query's is at least ``threshold``. Entries expire after
+    ``ttl_seconds`` and the least recently used one is evicted at
+    ``max_entries``. ``version_fn`` returns the vector store's current
+    version; when it changes, every cached answer is dropped, since the
+    retrieved context behind it may be stale.
+    """
+
+    def __init__(self, embeddings, threshold=0.95, max_entries=1024, ttl_seconds=3600, version_fn=None):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version_fn = version_fn
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._version = version_fn() if version_fn else None
+        self._entries = OrderedDict()  # slot -> (query, answer, sources, created)
+        self._vectors = None  # unit-length query embeddings, one row per slot
+        self._free = list(range(max_entries))
+        self._lock = threading.Lock()
+
+    def embed(self, query):
+        """Unit-length embedding of a query, for passing to lookup and put"""
+        vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _check_version(self):
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self._version:
+            self._version = version
+            if self._entries:
+                self.invalidations += 1
+            self._clear()
+
+    def _clear(self):
+        self._entries.clear()
+        self._free = list(range(self.max_entries))
+
+    def _drop(self, slot):
+        del self._entries[slot]
+        self._free.append(slot)
+
+    def lookup(self, query, vector=None):
+        """Cached (answer, sources) for a similar query, or None.
+
+        Pass ``vector`` to reuse an embedding the caller already has.
+        """
+        vector = self.embed(query) if vector is None else vector
+        now = time.monotonic()
+        with self._lock:
+            self._check_version()
+            for slot, (_, _, _, created) in list(self._entries.items()):
+                if now - created > self.ttl_seconds:
+                    self._drop(slot)
+
+            if self._entries:
+                slots = list(self._entries)
+                similarities = self._vectors[slots] @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    slot = slots[best]
+                    self._entries.move_to_end(slot)
+                    self.hits += 1
+                    _, answer, sources, _ = self._entries[slot]
+                    return answer, sources
+
+            self.misses += 1
+            return None
+
+    def put(self, query, answer, sources=None, vector=None):
+        vector = self.embed(query) if vector is None else vector
+        with self._lock:
+            self._check_version()
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            if not self._free:
+                self._drop(next(iter(self._entries)))  # least recently used
+            slot = self._free.pop()
+            self._vectors[slot] = vector
+            self._entries[slot] = (query, answer, sources or [], time.monotonic())
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "invalidations": self.invalidations
+        }
@@ -1,8 +1,38 @@
 # Update these imports
+from pathlib import Path
 from langchain_community.vectorstores import Chroma
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from config import CHROMA_DB_DIR
+from config import CHROMA_DB_DIR, EMBEDDING_MODEL_NAME, EMBEDDING_CACHE_DIR
+from llm.registry import register_model, get_model
+from llm.metrics import watch_cache
+from rag.embedding_cache import CachedEmbeddings
+
+def load_embeddings():
+    """Embedding function backed by the on-disk cache; the model loads on the first cache miss"""
+    embeddings = CachedEmbeddings(
+        EMBEDDING_MODEL_NAME,
+        lambda: get_model("embedding_model"),
+        EMBEDDING_CACHE_DIR
+    )
+    watch_cache("embedding", embeddings.stats)
+    return embeddings
+
+_updates = 0
+
+def mark_updated():
+    """Called after writing to the store from this process"""
+    global _updates
+    _updates += 1
+
+def store_version():
+    """Changes whenever the store is written, by this process or another (e.g. the indexer)"""
+    path = Path(CHROMA_DB_DIR) / "chroma.sqlite3"
+    return _updates, path.stat().st_mtime_ns if path.exists() else 0
 
 def get_vectorstore(persist=True):
-    embedding = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    return Chroma(persist_directory=CHROMA_DB_DIR, embedding_function=embedding)
+    return Chroma(persist_directory=CHROMA_DB_DIR, embedding_function=get_model("embeddings"))
+
+# Shared instances for callers that go through llm.registry.get_model
+register_model("embedding_model", lambda: HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME))
+register_model("embeddings", load_embeddings)
+register_model("vectorstore", get_vectorstore)
@@ -0,0 +1,269 @@
+"""Pool of pre-warmed Python workers for running untrusted snippets.
+
+Each worker is a long-lived interpreter that has already paid its startup
+and import cost. For every job it forks a child, applies CPU, memory and
+output-size rlimits to it, and runs the snippet there, so a run costs a
+fork instead of a fresh interpreter. Snippets cannot start processes or
+threads, and a pool running as root runs them as ``nobody``. This module
+only uses the standard library: workers run it as a script in isolated
+mode (-I).
+"""
+import json
+import os
+import queue
+import select
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+# Imported by each worker up front so snippets using them start instantly
+PRELOAD_MODULES = [
+    "collections", "datetime", "functools", "itertools", "json", "math",
+    "random", "re", "statistics", "string", "time", "typing",
+]
+
+POOL_SUPPORTED = hasattr(os, "fork") and sys.platform != "win32"
+
+
+class SandboxBusy(Exception):
+    """Raised when every worker is busy and the wait queue is full"""
+
+
+class _Worker:
+    def __init__(self):
+        self.runs = 0
+        self.proc = subprocess.Popen(
+            [sys.executable, "-I", os.path.abspath(__file__)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+
+    def run(self, job, timeout):
+        """Send one job and wait for its result; raises OSError if the worker died"""
+        self.runs += 1
+        self.proc.stdin.write(json.dumps(job).encode("utf-8") + b"\n")
+        self.proc.stdin.flush()
+
+        # The worker enforces the job timeout itself; this only guards against a hung worker
+        ready, _, _ = select.select([self.proc.stdout], [], [], timeout + 5)
+        line = self.proc.stdout.readline() if ready else b""
+        if not line:
+            raise OSError("sandbox worker stopped responding")
+        return json.loads(line)
+
+    def close(self):
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        self.proc.wait()
+
+
+class SandboxPool:
+    """Run snippets on a fixed number of pre-warmed workers.
+
+    At most ``size`` snippets run at once and at most ``max_queue`` more wait
+    for a free worker; beyond that ``run`` raises SandboxBusy immediately, and
+    a run that waits longer than its own timeout raises SandboxBusy too.
+    Workers are replaced after ``max_runs_per_worker`` runs or when they die.
+    """
+
+    def __init__(self, size=4, max_queue=16, max_runs_per_worker=100,
+                 cpu_seconds=5, memory_mb=256, max_output_bytes=64 * 1024):
+        self.size = size
+        self.max_runs_per_worker = max_runs_per_worker
+        self.limits = {
+            "cpu_seconds": cpu_seconds,
+            "memory_bytes": memory_mb * 1024 * 1024,
+            "max_output": max_output_bytes,
+        }
+        self._slots = threading.BoundedSemaphore(size + max_queue)
+        self._idle = queue.Queue()
+        self._waiting = 0
+        self._lock = threading.Lock()
+        for _ in range(size):
+            self._idle.put(_Worker())
+
+    def queue_depth(self):
+        """Number of runs waiting for a free worker"""
+        return self._waiting
+
+    def run(self, code, timeout=10):
+        """Run a snippet and return its returncode, stdout, stderr and limit flags"""
+        if not self._slots.acquire(blocking=False):
+            raise SandboxBusy("sandbox pool and wait queue are full")
+
+        try:
+            with self._lock:
+                self._waiting += 1
+            try:
+                # A queued run waits no longer than it would be allowed to run
+                worker = self._idle.get(timeout=timeout)
+            except queue.Empty:
+                raise SandboxBusy("no sandbox worker became free in time")
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+
+            job = dict(self.limits, code=code, timeout=timeout)
+            try:
+                return worker.run(job, timeout)
+            except (OSError, ValueError):
+                worker.runs = self.max_runs_per_worker  # recycle below
+                return {
+                    "returncode": None,
+                    "stdout": "",
+                    "stderr": "Sandbox worker crashed",
+                    "timed_out": False,
+                    "truncated": False
+                }
+            finally:
+                if worker.runs >= self.max_runs_per_worker or worker.proc.poll() is not None:
+                    worker.close()
+                    worker = _Worker()
+                self._idle.put(worker)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def _wait_child(pid, timeout):
+    """Wait up to timeout seconds for a child; returns its wait status or None"""
+    if hasattr(os, "pidfd_open"):
+        try:
+            fd = os.pidfd_open(pid)
+        except OSError:
+            fd = None
+        if fd is not None:
+            try:
+                ready, _, _ = select.select([fd], [], [], timeout)
+            finally:
+                os.close(fd)
+            if not ready:
+                return None
+            return os.waitpid(pid, 0)[1]
+
+    deadline = time.monotonic() + timeout
+    while True:
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            return status
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(0.002)
+
+
+def _run_child(job, stdout_fd, stderr_fd):
+    import resource
+    import traceback
+
+    status = 1
+    try:
+        os.setsid()
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+
+        resource.setrlimit(resource.RLIMIT_CPU, (job["cpu_seconds"], job["cpu_seconds"] + 1))
+        resource.setrlimit(resource.RLIMIT_AS, (job["memory_bytes"], job["memory_bytes"]))
+        # One byte over the output limit, so a snippet that writes exactly the limit is not flagged
+        resource.setrlimit(resource.RLIMIT_FSIZE, (job["max_output"] + 1, job["max_output"] + 1))
+
+        # No fork bombs: RLIMIT_NPROC counts every process and thread of the real UID, so 0
+        # stops the snippet creating any. Root is exempt from the limit, so drop to nobody first.
+        if os.getuid() == 0:
+            import pwd
+            nobody = pwd.getpwnam("nobody")
+            os.setgroups([])
+            os.setgid(nobody.pw_gid)
+            os.setuid(nobody.pw_uid)
+        resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+
+        sys.argv = ["-c"]
+        exec(compile(job["code"], "<string>", "exec"), {"__name__": "__main__", "__builtins__": __builtins__})
+        status = 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            status = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+    except BaseException as e:
+        # Skip this frame so the traceback looks like `python -c` output
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+        os._exit(status)
+
+
+def _run_job(job):
+    import tempfile
+
+    with tempfile.TemporaryFile() as stdout_file, tempfile.TemporaryFile() as stderr_file:
+        sys.stdout.flush()
+        pid = os.fork()
+        if pid == 0:
+            _run_child(job, stdout_file.fileno(), stderr_file.fileno())
+
+        status = _wait_child(pid, job["timeout"])
+        timed_out = status is None
+        try:
+            os.killpg(pid, signal.SIGKILL)  # the snippet and anything it spawned
+        except OSError:
+            pass
+        if timed_out:
+            status = os.waitpid(pid, 0)[1]
+        returncode = os.waitstatus_to_exitcode(status)
+
+        outputs = []
+        for f in (stdout_file, stderr_file):
+            f.seek(0)
+            outputs.append(f.read(job["max_output"] + 1))
+
+    truncated = any(len(data) > job["max_output"] for data in outputs)
+    stdout, stderr = (data[:job["max_output"]].decode("utf-8", errors="replace") for data in outputs)
+    notes = []
+    if returncode == -signal.SIGXCPU:
+        notes.append("CPU time limit exceeded")
+    if truncated:
+        notes.append("Output size limit exceeded")
+    stderr = "\n".join([stderr.rstrip("\n")] + notes if stderr else notes)
+
+    return {
+        "returncode": returncode,
+        "stdout": stdout,
+        "stderr": stderr,
+        "timed_out": timed_out,
+        "truncated": truncated
+    }
+
+
+def _worker_main():
+    for name in PRELOAD_MODULES:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+
+    for line in sys.stdin.buffer:
+        result = _run_job(json.loads(line))
+        sys.stdout.write(json.dumps(result) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    _worker_main()
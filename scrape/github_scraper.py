@@ -1,13 +1,25 @@
-import requests
 import os
-import json
+import base64
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from config import GITHUB_API_TOKEN, SUPPORTED_LANGUAGES, TRAINING_DATA_DIR
+from config import SCRAPER_MAX_WORKERS, HTTP_CACHE_DIR, HTTP_CACHE_MAX_MB
+from config import SHARD_RECORDS
+from scrape.http_client import HttpClient
+from scrape.shards import ShardWriter
 
 class GitHubCodeScraper:
-    def __init__(self):
-        self.headers = {"Authorization": f"token {GITHUB_API_TOKEN}"}
-        self.base_url = "https://api.github.com"
+    def __init__(self, base_url="https://api.github.com", token=GITHUB_API_TOKEN, max_workers=SCRAPER_MAX_WORKERS):
+        self.headers = {"Authorization": f"token {token}"} if token else {}
+        self.base_url = base_url.rstrip("/")
+        self.max_workers = max_workers
+        self.client = HttpClient(
+            headers=self.headers,
+            max_connections=max_workers,
+            cache_dir=HTTP_CACHE_DIR and os.path.join(HTTP_CACHE_DIR, "github"),
+            cache_max_bytes=HTTP_CACHE_MAX_MB * 1024 * 1024
+        )
         
     def search_repositories(self, language, min_stars=10, max_repos=100):
         """Search for popular repositories in a specific language"""
@@ -15,19 +27,19 @@ class GitHubCodeScraper:
         url = f"{self.base_url}/search/repositories"
         params = {"q": query, "sort": "stars", "per_page": max_repos}
         
-        response = requests.get(url, headers=self.headers, params=params)
-        return response.json().get("items", [])
+        data = self.client.get_json(url, params=params)
+        return (data or {}).get("items", [])
     
     def get_repository_files(self, repo_full_name, language):
         """Get code files from a repository"""
         url = f"{self.base_url}/repos/{repo_full_name}/git/trees/main"
         params = {"recursive": "1"}
         
-        response = requests.get(url, headers=self.headers, params=params)
-        if response.status_code != 200:
+        data = self.client.get_json(url, params=params)
+        if data is None:
             return []
             
-        tree = response.json().get("tree", [])
+        tree = data.get("tree", [])
         code_files = []
         
         for item in tree:
@@ -39,11 +51,10 @@ class GitHubCodeScraper:
     def download_file_content(self, repo_full_name, file_path):
         """Download content of a specific file"""
         url = f"{self.base_url}/repos/{repo_full_name}/contents/{file_path}"
-        response = requests.get(url, headers=self.headers)
+        data = self.client.get_json(url)
         
-        if response.status_code == 200:
-            content = response.json().get("content", "")
-            import base64
+        if data is not None:
+            content = data.get("content", "")
             return base64.b64decode(content).decode('utf-8', errors='ignore')
         return None
     
@@ -61,33 +72,51 @@ class GitHubCodeScraper:
         file_ext = Path(file_path).suffix.lower()
         return file_ext in extensions.get(language, [])
     
+    def fetch_repository_samples(self, repo, language):
+        """Fetch the code samples kept from one repository"""
+        code_samples = []
+        files = self.get_repository_files(repo["full_name"], language)
+        
+        for file_info in files[:10]:  # Limit files per repo
+            content = self.download_file_content(repo["full_name"], file_info["path"])
+            if content and len(content) < 10000:  # Skip very large files
+                code_samples.append({
+                    "repo": repo["full_name"],
+                    "file_path": file_info["path"],
+                    "content": content,
+                    "language": language,
+                    "stars": repo["stargazers_count"]
+                })
+                
+        return code_samples
+    
     def scrape_and_save(self, language, max_repos=100):
-        """Scrape repositories and save code samples"""
+        """Scrape repositories and stream code samples to JSONL shards; returns the sample count.
+        
+        Repos finished by an earlier, interrupted run are skipped.
+        """
         repos = self.search_repositories(language, max_repos=max_repos)
         
         save_dir = Path(TRAINING_DATA_DIR) / "github" / language
-        save_dir.mkdir(parents=True, exist_ok=True)
         
-        code_samples = []
-        
-        for repo in repos:
-            print(f"Processing {repo['full_name']}...")
-            files = self.get_repository_files(repo["full_name"], language)
+        with ShardWriter(save_dir, f"{language}_samples", SHARD_RECORDS) as writer:
+            repos = [repo for repo in repos if not writer.is_done(repo["full_name"])]
             
-            for file_info in files[:10]:  # Limit files per repo
-                content = self.download_file_content(repo["full_name"], file_info["path"])
-                if content and len(content) < 10000:  # Skip very large files
-                    code_samples.append({
-                        "repo": repo["full_name"],
-                        "file_path": file_info["path"],
-                        "content": content,
-                        "language": language,
-                        "stars": repo["stargazers_count"]
-                    })
-        
-        # Save to JSON
-        output_file = save_dir / f"{language}_samples.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(code_samples, f, indent=2, ensure_ascii=False)
+            # Repos are fetched concurrently but written in order, with at most
+            # max_workers of them held in memory at a time
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                pending = deque()
+                for repo in repos:
+                    pending.append((repo, pool.submit(self.fetch_repository_samples, repo, language)))
+                    if len(pending) >= self.max_workers:
+                        self._save_repository(writer, *pending.popleft())
+                while pending:
+                    self._save_repository(writer, *pending.popleft())
             
-        return code_samples
\ No newline at end of file
+        return writer.records
+    
+    def _save_repository(self, writer, repo, samples):
+        print(f"Processing {repo['full_name']}...")
+        for sample in samples.result():
+            writer.write(sample)
+        writer.mark_done(repo["full_name"])
@@ -0,0 +1,136 @@
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from llm.result_cache import ResultCache
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose rate follows the server's rate-limit headers"""
+
+    def __init__(self, rate=10.0, capacity=10):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def update(self, remaining, reset_at):
+        """Spread the remaining quota evenly until the window resets (reset_at is epoch seconds)"""
+        seconds_left = max(reset_at - time.time(), 1.0)
+        with self._lock:
+            if remaining <= 0:
+                self.tokens = 0.0
+                self.blocked_until = time.monotonic() + seconds_left
+            else:
+                self.rate = max(remaining / seconds_left, 0.01)
+                self.tokens = min(self.tokens, float(remaining))
+
+    def pause(self, seconds):
+        """Hold every request for the given number of seconds"""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class HttpClient:
+    """JSON-over-HTTP client shared by scraper threads.
+
+    One keep-alive session with a connection pool sized for ``max_connections``
+    threads; requests are paced by a TokenBucket fed from X-RateLimit-*
+    headers, retried with backoff on 403/429/5xx, and revalidated with
+    If-None-Match when ``cache_dir`` is given (a 304 returns the cached body).
+    """
+
+    RETRY_STATUSES = {403, 429, 500, 502, 503, 504}
+
+    def __init__(self, headers=None, max_connections=16, max_retries=5, backoff=1.0,
+                 cache_dir=None, cache_max_bytes=1024 * 1024 * 1024):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(headers or {})
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.bucket = TokenBucket()
+        self.cache = None
+        if cache_dir:
+            # Bodies are only read back to answer a 304, so none are kept in memory
+            self.cache = ResultCache(cache_dir, max_memory_entries=0, max_disk_bytes=cache_max_bytes)
+
+    def get_json(self, url, params=None):
+        """GET a JSON document; returns None on 404 or once retries are exhausted"""
+        key = ResultCache.make_key("GET", url, params or {})
+        cached = self.cache.get(key) if self.cache is not None else None
+        headers = {"If-None-Match": cached["etag"]} if cached else {}
+
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=30)
+            except requests.RequestException:
+                self._sleep_backoff(attempt)
+                continue
+
+            self._observe(response)
+
+            if response.status_code == 304 and cached:
+                return cached["data"]
+            if response.status_code == 200:
+                data = response.json()
+                self._check_body(data)
+                etag = response.headers.get("ETag")
+                if self.cache is not None and etag:
+                    self.cache.put(key, {"etag": etag, "data": data})
+                return data
+            if response.status_code not in self.RETRY_STATUSES:
+                return None
+
+            retry_after = response.headers.get("Retry-After")
+            rate_limited = response.headers.get("X-RateLimit-Remaining") == "0"
+            if response.status_code == 403 and not (retry_after or rate_limited):
+                return None  # a plain permission error, not throttling
+
+            if retry_after and retry_after.isdigit():
+                self.bucket.pause(int(retry_after))
+            elif not rate_limited:
+                self._sleep_backoff(attempt)
+            # Exhausted quota is handled by the bucket, which holds until the reset time
+
+        return None
+
+    def _observe(self, response):
+        """Feed rate-limit headers into the token bucket"""
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        if remaining is not None and reset is not None:
+            try:
+                self.bucket.update(int(remaining), float(reset))
+            except ValueError:
+                pass
+
+    def _check_body(self, data):
+        """Hook for APIs that signal throttling inside the response body"""
+
+    def _sleep_backoff(self, attempt):
+        time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random() / 2))
@@ -0,0 +1,125 @@
+import gzip
+import json
+import os
+from pathlib import Path
+
+RECORD_PATTERNS = ("*.jsonl.gz", "*.json")
+
+
+def iter_records(path):
+    """Yield records from a gzip JSONL shard or a legacy JSON list file"""
+    path = Path(path)
+    if path.name.endswith(".jsonl.gz"):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+
+
+def find_record_files(directory):
+    """All shard and legacy JSON files under a directory, in a stable order"""
+    directory = Path(directory)
+    if not directory.exists():
+        return []
+    files = set()
+    for pattern in RECORD_PATTERNS:
+        files.update(directory.rglob(pattern))
+    return sorted(files)
+
+
+class ShardWriter:
+    """Stream records into gzip-compressed JSONL shards with a resumable checkpoint.
+
+    Records are written to a ``.tmp`` shard that is renamed into place once it
+    holds at least ``records_per_shard`` records at the end of a unit of work
+    (or on close). Units passed to ``mark_done`` are only recorded in the
+    checkpoint after the shard holding their records is final, so a crash
+    loses at most the open shard and those units are simply redone on restart.
+    """
+
+    def __init__(self, directory, prefix, records_per_shard=1000):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.records_per_shard = records_per_shard
+        self.checkpoint_path = self.directory / f"{prefix}.checkpoint"
+
+        state = {"done": [], "next_shard": 0, "records": 0}
+        if self.checkpoint_path.exists():
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        self.done = set(state["done"])
+        self.next_shard = state["next_shard"]
+        self.records = state["records"]
+
+        # Drop output the checkpoint does not cover: an unfinished shard, or one
+        # renamed just before a crash that its units were never marked done for
+        for path in self.directory.glob(f"{prefix}-*.jsonl.gz*"):
+            index = int(path.name[len(prefix) + 1:].split(".")[0])
+            if path.name.endswith(".tmp") or index >= self.next_shard:
+                path.unlink()
+
+        self._file = None
+        self._shard_records = 0
+        self._pending_done = []
+
+    def is_done(self, key):
+        return key in self.done
+
+    def write(self, record):
+        if self._file is None:
+            self._file = gzip.open(self._shard_path() + ".tmp", "wt", encoding="utf-8")
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._shard_records += 1
+
+    def mark_done(self, key):
+        """Record a unit of work (a repo, a page) whose records have all been written"""
+        self._pending_done.append(key)
+        # Shards only rotate between units, so no unit's records span two shards
+        if self._file is None:
+            self._save_checkpoint()
+        elif self._shard_records >= self.records_per_shard:
+            self._finish_shard()
+
+    def close(self):
+        if self._file is not None:
+            self._finish_shard()
+        elif self._pending_done:
+            self._save_checkpoint()
+
+    def _shard_path(self):
+        return str(self.directory / f"{self.prefix}-{self.next_shard:05d}.jsonl.gz")
+
+    def _finish_shard(self):
+        self._file.close()
+        os.replace(self._shard_path() + ".tmp", self._shard_path())
+        self._file = None
+        self.records += self._shard_records
+        self._shard_records = 0
+        self.next_shard += 1
+        self._save_checkpoint()
+
+    def _save_checkpoint(self):
+        self.done.update(self._pending_done)
+        self._pending_done = []
+        tmp_path = str(self.checkpoint_path) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "done": sorted(self.done),
+                "next_shard": self.next_shard,
+                "records": self.records
+            }, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        # Finish the open shard on success; on error it stays .tmp and is redone on restart
+        if exc_info[0] is None:
+            self.close()
+        elif self._file is not None:
+            self._file.close()
@@ -1,15 +1,40 @@
-import requests
-import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from config import STACKOVERFLOW_API_KEY, TRAINING_DATA_DIR
+from config import SCRAPER_MAX_WORKERS, HTTP_CACHE_DIR, HTTP_CACHE_MAX_MB
+from config import SHARD_RECORDS
+from scrape.http_client import HttpClient
+from scrape.shards import ShardWriter
+
+class StackExchangeClient(HttpClient):
+    """HttpClient that honours the Stack Exchange `backoff` field"""
+    
+    def _check_body(self, data):
+        if data.get("backoff"):
+            self.bucket.pause(int(data["backoff"]))
 
 class StackOverflowScraper:
-    def __init__(self):
-        self.base_url = "https://api.stackexchange.com/2.3"
-        self.key = STACKOVERFLOW_API_KEY
+    def __init__(self, base_url="https://api.stackexchange.com/2.3", key=STACKOVERFLOW_API_KEY, max_workers=SCRAPER_MAX_WORKERS):
+        self.base_url = base_url.rstrip("/")
+        self.key = key
+        self.max_workers = max_workers
+        self.client = StackExchangeClient(
+            max_connections=max_workers,
+            cache_dir=HTTP_CACHE_DIR and os.path.join(HTTP_CACHE_DIR, "stackexchange"),
+            cache_max_bytes=HTTP_CACHE_MAX_MB * 1024 * 1024
+        )
         
     def get_questions_by_tag(self, tag, max_questions=1000):
         """Get questions for a specific programming language tag"""
+        questions = []
+        for _, page in self.iter_question_pages(tag, max_questions):
+            questions.extend(page)
+        return questions
+    
+    def iter_question_pages(self, tag, max_questions=1000, start_page=1):
+        """Yield (page number, questions) for a tag, up to max_questions in total"""
         url = f"{self.base_url}/questions"
         params = {
             "order": "desc",
@@ -21,27 +46,38 @@ class StackOverflowScraper:
             "key": self.key
         }
         
-        questions = []
-        page = 1
+        fetched = (start_page - 1) * params["pagesize"]
+        page = start_page
         
-        while len(questions) < max_questions:
+        while fetched < max_questions:
             params["page"] = page
-            response = requests.get(url, params=params)
+            data = self.client.get_json(url, params=dict(params))
             
-            if response.status_code != 200:
-                break
-                
-            data = response.json()
-            if not data.get("items"):
+            if not data or not data.get("items"):
                 break
                 
-            questions.extend(data["items"])
+            items = data["items"][:max_questions - fetched]
+            fetched += len(items)
+            yield page, items
             page += 1
             
             if data.get("has_more") is False:
                 break
-                
-        return questions[:max_questions]
+    
+    def get_answers_by_ids(self, answer_ids):
+        """Fetch up to 100 answers in one request, keyed by answer id; None if the request failed"""
+        url = f"{self.base_url}/answers/{';'.join(str(i) for i in answer_ids)}"
+        params = {
+            "site": "stackoverflow",
+            "filter": "withbody",
+            "pagesize": 100,
+            "key": self.key
+        }
+        
+        data = self.client.get_json(url, params=params)
+        if data is None:
+            return None
+        return {answer["answer_id"]: answer for answer in data.get("items", [])}
     
     def get_answers_for_question(self, question_id):
         """Get answers for a specific question"""
@@ -54,42 +90,70 @@ class StackOverflowScraper:
             "key": self.key
         }
         
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            return response.json().get("items", [])
+        data = self.client.get_json(url, params=params)
+        if data is not None:
+            return data.get("items", [])
         return []
     
     def scrape_qa_pairs(self, language_tag, max_questions=1000):
-        """Scrape Q&A pairs for a programming language"""
-        questions = self.get_questions_by_tag(language_tag, max_questions)
-        
-        qa_pairs = []
+        """Scrape Q&A pairs and stream them to JSONL shards; returns the pair count.
         
-        for question in questions:
-            if question.get("accepted_answer_id"):
-                answers = self.get_answers_for_question(question["question_id"])
-                accepted_answer = next(
-                    (a for a in answers if a["answer_id"] == question["accepted_answer_id"]),
-                    None
-                )
-                
-                if accepted_answer:
-                    qa_pairs.append({
-                        "question_title": question["title"],
-                        "question_body": question["body"],
-                        "answer_body": accepted_answer["body"],
-                        "question_score": question["score"],
-                        "answer_score": accepted_answer["score"],
-                        "tags": question["tags"],
-                        "language": language_tag
-                    })
-        
-        # Save to JSON
+        Pages finished by an earlier, interrupted run are skipped. If a page's
+        answers cannot be fetched, the run stops before that page so the next
+        run resumes from it.
+        """
         save_dir = Path(TRAINING_DATA_DIR) / "stackoverflow"
-        save_dir.mkdir(parents=True, exist_ok=True)
         
-        output_file = save_dir / f"{language_tag}_qa.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(qa_pairs, f, indent=2, ensure_ascii=False)
+        with ShardWriter(save_dir, f"{language_tag}_qa", SHARD_RECORDS) as writer:
+            # Pages are written in order, so the finished ones are always a prefix
+            start_page = 1
+            while writer.is_done(f"page-{start_page}"):
+                start_page += 1
+            
+            # Accepted answers are fetched in bulk, in the background while the next question page loads
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                pending = deque()
+                saved = True
+                for page, questions in self.iter_question_pages(language_tag, max_questions, start_page):
+                    accepted = [q for q in questions if q.get("accepted_answer_id")]
+                    answer_ids = [q["accepted_answer_id"] for q in accepted]
+                    batches = [
+                        pool.submit(self.get_answers_by_ids, answer_ids[i:i + 100])
+                        for i in range(0, len(answer_ids), 100)
+                    ]
+                    pending.append((page, accepted, batches))
+                    if len(pending) > self.max_workers:
+                        saved = self._save_page(writer, language_tag, *pending.popleft())
+                        if not saved:
+                            break
+                while pending and saved:
+                    saved = self._save_page(writer, language_tag, *pending.popleft())
+            
+        return writer.records
+    
+    def _save_page(self, writer, language_tag, page, accepted, batches):
+        """Write a page's Q&A pairs and mark it done; False, writing nothing, if an answer batch failed"""
+        answers = {}
+        for batch in batches:
+            result = batch.result()
+            if result is None:
+                # Later pages are not saved either: finished pages must stay a prefix
+                print(f"Stopping at page {page}: its answers could not be fetched; rerun to resume")
+                return False
+            answers.update(result)
+        
+        for question in accepted:
+            accepted_answer = answers.get(question["accepted_answer_id"])
             
-        return qa_pairs
\ No newline at end of file
+            if accepted_answer:
+                writer.write({
+                    "question_title": question["title"],
+                    "question_body": question["body"],
+                    "answer_body": accepted_answer["body"],
+                    "question_score": question["score"],
+                    "answer_score": accepted_answer["score"],
+                    "tags": question["tags"],
+                    "language": language_tag
+                })
+        writer.mark_done(f"page-{page}")
+        return True
@@ -1,4 +1,100 @@
-def update_knowledge_base(urls: list):
-    new_texts = [extract_clean_text(url) for url in urls]
-    vectorstore.add_texts(new_texts)
-    vectorstore.persist()
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from config import SCRAPER_MAX_WORKERS, KB_CHUNK_SIZE, KB_CHUNK_OVERLAP, KB_UPSERT_BATCH_SIZE
+from llm.registry import get_model
+from scrape.clean_extractor import extract_clean_text
+from rag.vectorstore import mark_updated  # also registers "vectorstore"
+import rag.bm25_index  # registers "bm25_index"
+
+def _fetch(url):
+    try:
+        return extract_clean_text(url)
+    except Exception as e:
+        print(f"Error fetching {url}: {e}")
+        return None
+
+def _chunk_id(url, index):
+    # Stable across runs, so a refreshed chunk overwrites its previous version
+    return f"{hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]}-{index}"
+
+def _batches(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def update_knowledge_base(urls: list, vectorstore=None):
+    """Fetch, chunk and upsert pages into the knowledge base.
+
+    Every chunk is stored under a stable id (URL hash + chunk index) with the
+    SHA-256 of its text in its metadata. Chunks whose stored hash matches are
+    skipped, so only new or changed text is embedded; chunks left over from a
+    page that got shorter are deleted. The BM25 index gets the same writes.
+    URLs that fail to fetch are left as they are. Returns counts of what changed.
+    """
+    vectorstore = vectorstore or get_model("vectorstore")
+    bm25_index = get_model("bm25_index")
+    splitter = RecursiveCharacterTextSplitter(chunk_size=KB_CHUNK_SIZE, chunk_overlap=KB_CHUNK_OVERLAP)
+
+    with ThreadPoolExecutor(max_workers=SCRAPER_MAX_WORKERS) as executor:
+        pages = list(executor.map(_fetch, urls))
+
+    ids, texts, metadatas = [], [], []
+    fetched = []
+    for url, page in zip(urls, pages):
+        if not page:
+            continue
+        fetched.append(url)
+        for index, chunk in enumerate(splitter.split_text(page)):
+            ids.append(_chunk_id(url, index))
+            texts.append(chunk)
+            metadatas.append({
+                "source": url,
+                "chunk": index,
+                "content_hash": hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+            })
+
+    stored_hashes = {}
+    for batch in _batches(ids, KB_UPSERT_BATCH_SIZE):
+        stored = vectorstore.get(ids=batch, include=["metadatas"])
+        for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+            stored_hashes[chunk_id] = (metadata or {}).get("content_hash")
+
+    changed = [i for i, chunk_id in enumerate(ids) if stored_hashes.get(chunk_id) != metadatas[i]["content_hash"]]
+    for batch in _batches(changed, KB_UPSERT_BATCH_SIZE):
+        # One embedding call per batch; Chroma upserts by id
+        vectorstore.add_texts(
+            [texts[i] for i in batch],
+            metadatas=[metadatas[i] for i in batch],
+            ids=[ids[i] for i in batch]
+        )
+        bm25_index.add([ids[i] for i in batch], [texts[i] for i in batch], [metadatas[i] for i in batch])
+
+    current = set(ids)
+    stale = []
+    for url in fetched:
+        stored = vectorstore.get(where={"source": url}, include=[])
+        stale.extend(chunk_id for chunk_id in stored["ids"] if chunk_id not in current)
+    for batch in _batches(stale, KB_UPSERT_BATCH_SIZE):
+        vectorstore.delete(ids=batch)
+        bm25_index.delete(batch)
+
+    if changed or stale:
+        mark_updated()
+        # Newer Chroma versions persist automatically and no longer have persist()
+        if hasattr(vectorstore, "persist"):
+            vectorstore.persist()
+
+    stats = {
+        "urls": len(urls),
+        "failed": len(urls) - len(fetched),
+        "chunks": len(ids),
+        "added": sum(1 for i in changed if ids[i] not in stored_hashes),
+        "updated": sum(1 for i in changed if ids[i] in stored_hashes),
+        "deleted": len(stale)
+    }
+    print(f"Knowledge base: {stats['added']} chunks added, {stats['updated']} updated, "
+          f"{stats['deleted']} deleted, {len(ids) - len(changed)} unchanged "
+          f"({stats['failed']} of {stats['urls']} URLs failed)")
+    return stats
@@ -0,0 +1,40 @@
+import hashlib
+from pathlib import Path
+from config import TRAINING_DATA_DIR, DEDUP_DATA_DIR, VALIDATION_PERCENT
+from scrape.shards import iter_records, find_record_files
+
+def record_to_text(item):
+    """Training text for a scraped record, or None for records of unknown shape"""
+    if 'content' in item:  # GitHub code
+        return item['content']
+    elif 'question_body' in item:  # StackOverflow Q&A
+        return f"Question: {item['question_title']}\n{item['question_body']}\nAnswer: {item['answer_body']}"
+    return None
+
+# Written last by `main.py --mode dedup`
+DEDUP_REPORT_NAME = "dedup_report.json"
+
+def corpus_files(data_dir=None):
+    """Record files to train on; defaults to the deduplicated corpus when one exists"""
+    if data_dir is None:
+        deduplicated = (Path(DEDUP_DATA_DIR) / DEDUP_REPORT_NAME).exists()
+        data_dir = DEDUP_DATA_DIR if deduplicated else TRAINING_DATA_DIR
+    data_dir = Path(data_dir)
+    return find_record_files(data_dir / "github") + find_record_files(data_dir / "stackoverflow")
+
+def record_split(text, val_percent=VALIDATION_PERCENT):
+    """Assign a training text to "train" or "val" by a hash of its content.
+
+    The split is per record and stable across runs and file layouts, so every
+    language and source is represented in both sets.
+    """
+    bucket = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:4], "big") % 100
+    return "val" if bucket < val_percent else "train"
+
+def iter_texts(files):
+    """Training texts from record files, in file order"""
+    for file_path in files:
+        for item in iter_records(file_path):
+            text = record_to_text(item)
+            if text is not None:
+                yield text
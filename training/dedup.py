@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import zlib
+from collections import Counter, deque
+from multiprocessing import Pool
+from pathlib import Path
+
+import numpy as np
+
+from config import TRAINING_DATA_DIR, DEDUP_DATA_DIR, SHARD_RECORDS
+from config import DEDUP_NUM_PERM, DEDUP_BANDS, DEDUP_SHINGLE_SIZE, DEDUP_THRESHOLD
+from scrape.shards import ShardWriter, iter_records, find_record_files
+from training.corpus import record_to_text, DEDUP_REPORT_NAME
+
+# MinHash permutations are h -> (a * h + b) mod P over 32-bit shingle hashes;
+# with P = 2^31 - 1 the products stay below 2^63, so uint64 math cannot overflow
+_PRIME = (1 << 31) - 1
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_BATCH_SIZE = 256
+
+_worker_params = None
+
+def normalize(text):
+    """Content used for exact matching: stripped lines, blank lines dropped"""
+    lines = (line.strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+def minhash_signature(text, a, b, shingle_size):
+    tokens = _TOKEN_RE.findall(text)
+    count = max(len(tokens) - shingle_size + 1, 1)
+    shingles = {zlib.crc32(" ".join(tokens[i:i + shingle_size]).encode("utf-8")) for i in range(count)}
+    hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+    return ((np.outer(hashes, a) + b) % _PRIME).min(axis=0)
+
+def _init_worker(num_perm, bands, shingle_size):
+    global _worker_params
+    # Fixed seed: every worker (and every run) must use the same permutations
+    rng = np.random.default_rng(0)
+    a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+    b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+    _worker_params = (a, b, bands, shingle_size)
+
+def _fingerprint_batch(texts):
+    """Exact key, MinHash signature and LSH band keys for each text"""
+    a, b, bands, shingle_size = _worker_params
+    results = []
+    for text in texts:
+        normalized = normalize(text)
+        exact = hashlib.sha1(normalized.encode("utf-8")).digest()
+        signature = minhash_signature(normalized, a, b, shingle_size)
+        band_keys = [hashlib.blake2b(band.tobytes(), digest_size=8).digest()
+                     for band in np.split(signature, bands)]
+        # Values are below 2^31, so uint32 halves what the pool ships and what is kept
+        results.append((exact, signature.astype(np.uint32), band_keys))
+    return results
+
+def _describe(item):
+    if "repo" in item:
+        return f"{item['repo']}:{item.get('file_path', '')}"
+    return item.get("question_title", "")
+
+class _Deduplicator:
+    """First occurrence wins; later exact or near copies are dropped.
+
+    An LSH band collision only makes a kept record a candidate: the record is
+    dropped when the fraction of agreeing MinHash rows, an estimate of the
+    Jaccard similarity, reaches ``threshold``. Band false positives are kept.
+    """
+
+    def __init__(self, bands, threshold):
+        self.threshold = threshold
+        self.exact = {}
+        self.band_tables = [{} for _ in range(bands)]  # band key -> indices of kept records
+        self.kept = []
+        self.signatures = []
+
+    def check(self, description, exact, signature, band_keys):
+        """Returns (reason, duplicate_of, similarity) for a duplicate, or None to keep the record"""
+        if exact in self.exact:
+            return "exact", self.kept[self.exact[exact]], 1.0
+
+        candidates = set()
+        for table, key in zip(self.band_tables, band_keys):
+            candidates.update(table.get(key, ()))
+        best, best_similarity = None, 0.0
+        for candidate in candidates:
+            similarity = float(np.mean(self.signatures[candidate] == signature))
+            if similarity > best_similarity:
+                best, best_similarity = candidate, similarity
+        if best is not None and best_similarity >= self.threshold:
+            return "near", self.kept[best], best_similarity
+
+        index = len(self.kept)
+        self.kept.append(description)
+        self.signatures.append(signature)
+        self.exact[exact] = index
+        for table, key in zip(self.band_tables, band_keys):
+            table.setdefault(key, []).append(index)
+        return None
+
+def _file_batches(files, pending):
+    """Yield text batches that never span files; records wait in `pending` until fingerprinted"""
+    for path in files:
+        batch = []
+        for item in iter_records(path):
+            text = record_to_text(item)
+            if text is not None:
+                batch.append((item, text))
+            if len(batch) == _BATCH_SIZE:
+                pending.append((path, False, batch))
+                yield [text for _, text in batch]
+                batch = []
+        pending.append((path, True, batch))
+        yield [text for _, text in batch]
+
+def deduplicate_corpus(data_dir=TRAINING_DATA_DIR, output_dir=DEDUP_DATA_DIR, num_proc=None):
+    """Drop exact and near-duplicate records from the scraped corpus.
+
+    Exact duplicates share a hash of their normalized content. Near duplicates
+    are found with MinHash over token shingles and LSH banding: records whose
+    signatures agree on all rows of any band are candidates (likely above
+    0.7 Jaccard similarity with the default 16 bands of 8 rows), and a
+    candidate is dropped when its estimated similarity to a kept record
+    reaches DEDUP_THRESHOLD.
+    Fingerprints are computed on a process pool. Kept records are written to
+    ``output_dir`` with the same github/ and stackoverflow/ layout, followed
+    by a JSON report and a JSONL list of everything dropped.
+    """
+    data_dir = Path(data_dir)
+    output_dir = Path(output_dir)
+    shutil.rmtree(output_dir, ignore_errors=True)  # always a full rebuild
+    output_dir.mkdir(parents=True)
+
+    dedup = _Deduplicator(DEDUP_BANDS, DEDUP_THRESHOLD)
+    stats = {}
+    duplicated = Counter()
+    pool_args = (DEDUP_NUM_PERM, DEDUP_BANDS, DEDUP_SHINGLE_SIZE)
+
+    with Pool(num_proc or os.cpu_count(), initializer=_init_worker, initargs=pool_args) as pool, \
+            open(output_dir / "dropped.jsonl", "w", encoding="utf-8") as dropped:
+        for source in ("github", "stackoverflow"):
+            counts = stats[source] = {"records": 0, "kept": 0, "exact": 0, "near": 0}
+            pending = deque()
+            files = find_record_files(data_dir / source)
+
+            with ShardWriter(output_dir / source, "dedup", SHARD_RECORDS) as writer:
+                for fingerprints in pool.imap(_fingerprint_batch, _file_batches(files, pending)):
+                    path, last, batch = pending.popleft()
+                    for (item, _), (exact, signature, band_keys) in zip(batch, fingerprints):
+                        counts["records"] += 1
+                        description = _describe(item)
+                        duplicate = dedup.check(description, exact, signature, band_keys)
+                        if duplicate is None:
+                            counts["kept"] += 1
+                            writer.write(item)
+                            continue
+                        reason, duplicate_of, similarity = duplicate
+                        counts[reason] += 1
+                        duplicated[duplicate_of] += 1
+                        dropped.write(json.dumps({
+                            "source": source,
+                            "record": description,
+                            "reason": reason,
+                            "duplicate_of": duplicate_of,
+                            "similarity": round(similarity, 3)
+                        }, ensure_ascii=False) + "\n")
+                    if last:
+                        writer.mark_done(str(path.relative_to(data_dir)))
+
+            print(f"{source}: kept {counts['kept']} of {counts['records']} records "
+                  f"({counts['exact']} exact, {counts['near']} near duplicates dropped)")
+
+    report = {
+        "num_perm": DEDUP_NUM_PERM,
+        "bands": DEDUP_BANDS,
+        "shingle_size": DEDUP_SHINGLE_SIZE,
+        "threshold": DEDUP_THRESHOLD,
+        "sources": stats,
+        "most_duplicated": [{"record": record, "copies_dropped": count}
+                            for record, count in duplicated.most_common(100)]
+    }
+    # Written last: its presence marks a complete deduplicated corpus
+    with open(output_dir / DEDUP_REPORT_NAME, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    return report
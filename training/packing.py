@@ -0,0 +1,70 @@
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+class PackedDataset(Dataset):
+    """Fixed-length blocks cut from all documents joined by EOS separators.
+
+    ``source`` is a TokenizedDataset, or anything with the same
+    ``document``/``document_lengths`` interface. The concatenated stream is
+    never materialized: block i covers stream positions
+    [i * block_size, (i + 1) * block_size) and is assembled from the source's
+    documents on access. The trailing partial block is dropped.
+    """
+
+    def __init__(self, source, eos_token_id, block_size=512):
+        self.source = source
+        self.eos_token_id = eos_token_id
+        self.block_size = block_size
+
+        # Each document takes its length plus one EOS in the stream
+        self._ends = np.cumsum(source.document_lengths().astype(np.int64) + 1)
+
+    def __len__(self):
+        total = int(self._ends[-1]) if len(self._ends) else 0
+        return total // self.block_size
+
+    def __getitem__(self, idx):
+        position = idx * self.block_size
+        doc = int(np.searchsorted(self._ends, position, side="right"))
+        offset = position - (int(self._ends[doc - 1]) if doc else 0)
+
+        pieces = []
+        needed = self.block_size
+        while needed > 0:
+            ids = np.append(self.source.document(doc)[offset:], self.eos_token_id)
+            pieces.append(ids[:needed])
+            needed -= len(pieces[-1])
+            doc += 1
+            offset = 0
+
+        input_ids = torch.from_numpy(np.concatenate(pieces).astype(np.int64))
+        return {
+            "input_ids": input_ids,
+            "attention_mask": torch.ones_like(input_ids),
+            "labels": input_ids.clone()
+        }
+
+class DynamicPaddingCollator:
+    """Pad each batch only to its longest item, masking padded labels with -100"""
+
+    def __init__(self, pad_token_id, pad_to_multiple_of=8):
+        self.pad_token_id = pad_token_id
+        self.pad_to_multiple_of = pad_to_multiple_of
+
+    def __call__(self, features):
+        length = max(len(f["input_ids"]) for f in features)
+        if self.pad_to_multiple_of:
+            length = -(-length // self.pad_to_multiple_of) * self.pad_to_multiple_of
+
+        input_ids = torch.full((len(features), length), self.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(features), length), dtype=torch.long)
+        labels = torch.full((len(features), length), -100, dtype=torch.long)
+
+        for row, feature in enumerate(features):
+            n = len(feature["input_ids"])
+            input_ids[row, :n] = torch.as_tensor(feature["input_ids"])
+            attention_mask[row, :n] = 1
+            labels[row, :n] = torch.as_tensor(feature.get("labels", feature["input_ids"]))
+
+        return {"input_ids": input_ids, "attention_mask": attention_mask, "labels": labels}
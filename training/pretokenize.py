@@ -0,0 +1,156 @@
+import bisect
+import json
+import os
+from multiprocessing import Pool
+from pathlib import Path
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+from transformers import AutoTokenizer
+
+from config import TOKENIZED_DATA_DIR, CODE_MODEL_NAME
+from config import TOKENIZE_BATCH_SIZE, TOKEN_SHARD_SIZE
+from training.corpus import corpus_files, record_split, iter_texts
+
+# Layout of a tokenized corpus directory:
+#   meta.json               tokenizer name, token dtype and the shards of each split
+#   {split}-00000.bin       token ids of consecutive documents, raw array of `dtype`
+#   {split}-00000.idx.npy   int64 offsets into the .bin; document i is [off[i], off[i + 1])
+
+_worker_tokenizer = None
+
+def _init_worker(model_name):
+    global _worker_tokenizer
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"  # parallelism comes from the process pool
+    _worker_tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+def _tokenize_batch(texts):
+    ids = _worker_tokenizer(texts, add_special_tokens=False)["input_ids"]
+    return [(record_split(text), doc_ids) for text, doc_ids in zip(texts, ids)]
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def has_tokenized_data(data_dir):
+    return (Path(data_dir) / "meta.json").exists()
+
+class _TokenShardWriter:
+    def __init__(self, output_dir, split, dtype, shard_size):
+        self.output_dir = Path(output_dir)
+        self.split = split
+        self.dtype = dtype
+        self.shard_size = shard_size
+        self.shards = []
+        self.documents = 0
+        self.tokens = 0
+        self._file = None
+
+    def add(self, ids):
+        if self._file is None:
+            self._name = f"{self.split}-{len(self.shards):05d}"
+            self._file = open(self.output_dir / f"{self._name}.bin", "wb")
+            self._offsets = [0]
+        self._file.write(np.asarray(ids, dtype=self.dtype).tobytes())
+        self._offsets.append(self._offsets[-1] + len(ids))
+        self.documents += 1
+        self.tokens += len(ids)
+        if self._offsets[-1] >= self.shard_size:
+            self.close()
+
+    def close(self):
+        if self._file is None:
+            return
+        self._file.close()
+        np.save(self.output_dir / f"{self._name}.idx.npy", np.asarray(self._offsets, dtype=np.int64))
+        self.shards.append(self._name)
+        self._file = None
+
+def pretokenize_corpus(data_dir=None, output_dir=TOKENIZED_DATA_DIR, num_proc=None):
+    """Tokenize the scraped corpus once into memory-mappable token shards"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    (output_dir / "meta.json").unlink(missing_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(CODE_MODEL_NAME)
+    dtype = np.uint16 if len(tokenizer) <= np.iinfo(np.uint16).max + 1 else np.int32
+
+    meta = {"tokenizer": CODE_MODEL_NAME, "dtype": np.dtype(dtype).name, "splits": {}}
+    writers = {split: _TokenShardWriter(output_dir, split, dtype, TOKEN_SHARD_SIZE) for split in ("train", "val")}
+
+    with Pool(num_proc or os.cpu_count(), initializer=_init_worker, initargs=(CODE_MODEL_NAME,)) as pool:
+        # Same per-record hash split as the streaming dataset
+        batches = _batches(iter_texts(corpus_files(data_dir)), TOKENIZE_BATCH_SIZE)
+        for batch in pool.imap(_tokenize_batch, batches):
+            for split, ids in batch:
+                writers[split].add(ids)
+
+    for split, writer in writers.items():
+        writer.close()
+        meta["splits"][split] = writer.shards
+        print(f"Tokenized {writer.documents} {split} documents ({writer.tokens} tokens)")
+
+    # Written last, so a partial run is never mistaken for a usable corpus
+    with open(output_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    return meta
+
+class TokenizedDataset(Dataset):
+    """Documents read from pre-tokenized shards through read-only memory maps.
+
+    Shards are mapped lazily in each process, so DataLoader workers share the
+    page cache instead of holding their own copies, and no text is tokenized.
+    """
+
+    def __init__(self, data_dir, split, max_length=512):
+        self.data_dir = Path(data_dir)
+        self.max_length = max_length
+
+        with open(self.data_dir / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dtype = np.dtype(meta["dtype"])
+        self.shards = meta["splits"][split]
+        self.offsets = [np.load(self.data_dir / f"{name}.idx.npy", mmap_mode="r") for name in self.shards]
+
+        # First global document index of each shard
+        self._starts = np.cumsum([0] + [len(o) - 1 for o in self.offsets]).tolist()
+        self._tokens = {}
+
+    def _shard_tokens(self, shard):
+        if shard not in self._tokens:
+            path = self.data_dir / f"{self.shards[shard]}.bin"
+            if path.stat().st_size == 0:  # a shard of empty documents cannot be mapped
+                self._tokens[shard] = np.empty(0, dtype=self.dtype)
+            else:
+                self._tokens[shard] = np.memmap(path, dtype=self.dtype, mode="r")
+        return self._tokens[shard]
+
+    def document(self, idx):
+        """Token ids of one document as a view into its shard"""
+        shard = bisect.bisect_right(self._starts, idx) - 1
+        local = idx - self._starts[shard]
+        offsets = self.offsets[shard]
+        return self._shard_tokens(shard)[offsets[local]:offsets[local + 1]]
+
+    def document_lengths(self):
+        return np.concatenate([np.diff(offsets) for offsets in self.offsets] or [np.empty(0, dtype=np.int64)])
+
+    def __len__(self):
+        return self._starts[-1]
+
+    def __getitem__(self, idx):
+        # One document, truncated to max_length but not padded; DynamicPaddingCollator pads each batch
+        input_ids = torch.from_numpy(self.document(idx)[:self.max_length].astype(np.int64))
+        return {
+            "input_ids": input_ids,
+            "attention_mask": torch.ones_like(input_ids),
+            "labels": input_ids.clone()
+        }
@@ -0,0 +1,97 @@
+import random
+
+import torch
+from torch.utils.data import IterableDataset, get_worker_info
+
+from config import SHUFFLE_BUFFER_SIZE
+from scrape.shards import iter_records
+from training.corpus import record_to_text, record_split
+
+class StreamingCodeDataset(IterableDataset):
+    """Training examples streamed lazily from the scraped record files.
+
+    Records are read one file at a time and only ``shuffle_buffer`` of them
+    are held in memory, so peak memory does not grow with the corpus. Each
+    record goes to train or val by a hash of its text (see record_split).
+    With DataLoader workers, files are divided between workers; when there
+    are fewer files than workers, every worker reads all files and keeps
+    every n-th record instead.
+
+    With pack=True, documents are joined with EOS separators and yielded as
+    full ``max_length`` blocks; otherwise each document is yielded on its own,
+    truncated to ``max_length`` and unpadded.
+    """
+
+    def __init__(self, files, tokenizer, split, max_length=512, shuffle_buffer=SHUFFLE_BUFFER_SIZE,
+                 pack=False, seed=42):
+        self.files = list(files)
+        self.tokenizer = tokenizer
+        self.split = split
+        self.max_length = max_length
+        self.shuffle_buffer = shuffle_buffer
+        self.pack = pack
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        """Called by Trainer each epoch so the shuffle order changes between epochs"""
+        self.epoch = epoch
+
+    def _iter_texts(self, worker_id, num_workers):
+        if len(self.files) >= num_workers:
+            files, stride = self.files[worker_id::num_workers], 1
+        else:
+            files, stride = self.files, num_workers
+
+        position = 0
+        for file_path in files:
+            for item in iter_records(file_path):
+                position += 1
+                if (position - 1) % stride != worker_id % stride:
+                    continue
+                text = record_to_text(item)
+                if text is not None and record_split(text) == self.split:
+                    yield text
+
+    def _shuffle(self, texts, rng):
+        buffer = []
+        for text in texts:
+            if len(buffer) < self.shuffle_buffer:
+                buffer.append(text)
+                continue
+            i = rng.randrange(len(buffer))
+            yield buffer[i]
+            buffer[i] = text
+        rng.shuffle(buffer)
+        yield from buffer
+
+    def _example(self, ids):
+        input_ids = torch.tensor(ids, dtype=torch.long)
+        return {
+            "input_ids": input_ids,
+            "attention_mask": torch.ones_like(input_ids),
+            "labels": input_ids.clone()
+        }
+
+    def __iter__(self):
+        worker = get_worker_info()
+        worker_id, num_workers = (worker.id, worker.num_workers) if worker else (0, 1)
+
+        texts = self._iter_texts(worker_id, num_workers)
+        if self.split == "train" and self.shuffle_buffer > 1:
+            rng = random.Random(hash((self.seed, self.epoch, worker_id)))
+            texts = self._shuffle(texts, rng)
+
+        if not self.pack:
+            for text in texts:
+                yield self._example(self.tokenizer(text, truncation=True, max_length=self.max_length)["input_ids"])
+            return
+
+        # Packing: carry the tail of each block over into the next one
+        stream = []
+        for text in texts:
+            stream.extend(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+            stream.append(self.tokenizer.eos_token_id)
+            while len(stream) >= self.max_length:
+                yield self._example(stream[:self.max_length])
+                del stream[:self.max_length]
@@ -1,52 +1,12 @@
-import json
 import torch
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import IterableDataset
 from transformers import AutoTokenizer, AutoModelForCausalLM, Trainer, TrainingArguments
-from pathlib import Path
-from config import TRAINING_DATA_DIR, CODE_MODEL_NAME, BATCH_SIZE, LEARNING_RATE
-
-class CodeDataset(Dataset):
-    def __init__(self, data_files, tokenizer, max_length=512):
-        self.tokenizer = tokenizer
-        self.max_length = max_length
-        self.examples = []
-        
-        for file_path in data_files:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.examples.extend(self._process_data(data))
-    
-    def _process_data(self, data):
-        """Process different types of training data"""
-        examples = []
-        
-        for item in data:
-            if 'content' in item:  # GitHub code
-                examples.append(item['content'])
-            elif 'question_body' in item:  # StackOverflow Q&A
-                qa_text = f"Question: {item['question_title']}\n{item['question_body']}\nAnswer: {item['answer_body']}"
-                examples.append(qa_text)
-                
-        return examples
-    
-    def __len__(self):
-        return len(self.examples)
-    
-    def __getitem__(self, idx):
-        text = self.examples[idx]
-        encoding = self.tokenizer(
-            text,
-            truncation=True,
-            max_length=self.max_length,
-            padding="max_length",
-            return_tensors="pt"
-        )
-        
-        return {
-            "input_ids": encoding["input_ids"].flatten(),
-            "attention_mask": encoding["attention_mask"].flatten(),
-            "labels": encoding["input_ids"].flatten()
-        }
+from config import CODE_MODEL_NAME, BATCH_SIZE, LEARNING_RATE, TOKENIZED_DATA_DIR
+from config import PACK_SEQUENCES, TRAINING_MAX_STEPS, DATALOADER_NUM_WORKERS
+from training.corpus import corpus_files
+from training.pretokenize import TokenizedDataset, has_tokenized_data
+from training.packing import PackedDataset, DynamicPaddingCollator
+from training.streaming import StreamingCodeDataset
 
 class CodeModelTrainer:
     def __init__(self):
@@ -56,23 +16,26 @@ class CodeModelTrainer:
         if self.tokenizer.pad_token is None:
             self.tokenizer.pad_token = self.tokenizer.eos_token
     
-    def prepare_dataset(self):
-        """Prepare training dataset from scraped data"""
-        data_dir = Path(TRAINING_DATA_DIR)
-        
-        # Collect all training files
-        github_files = list((data_dir / "github").rglob("*.json"))
-        stackoverflow_files = list((data_dir / "stackoverflow").rglob("*.json"))
+    def prepare_dataset(self, pack=PACK_SEQUENCES):
+        """Prepare training dataset from scraped data.
         
-        all_files = github_files + stackoverflow_files
+        With pack=True, documents are joined with EOS separators and cut into
+        full-length blocks so no compute is spent on padding.
+        """
+        eos_token_id = self.tokenizer.eos_token_id
         
-        # Split into train/validation
-        split_idx = int(0.8 * len(all_files))
-        train_files = all_files[:split_idx]
-        val_files = all_files[split_idx:]
+        # Prefer the output of `main.py --mode tokenize`, which skips the tokenizer entirely
+        if has_tokenized_data(TOKENIZED_DATA_DIR):
+            train_dataset = TokenizedDataset(TOKENIZED_DATA_DIR, "train")
+            val_dataset = TokenizedDataset(TOKENIZED_DATA_DIR, "val")
+            if pack:
+                return PackedDataset(train_dataset, eos_token_id), PackedDataset(val_dataset, eos_token_id)
+            return train_dataset, val_dataset
         
-        train_dataset = CodeDataset(train_files, self.tokenizer)
-        val_dataset = CodeDataset(val_files, self.tokenizer)
+        # Otherwise stream records from the scraped shards; the train/val split is per record
+        files = corpus_files()
+        train_dataset = StreamingCodeDataset(files, self.tokenizer, "train", pack=pack)
+        val_dataset = StreamingCodeDataset(files, self.tokenizer, "val", pack=pack)
         
         return train_dataset, val_dataset
     
@@ -84,6 +47,9 @@ class CodeModelTrainer:
             output_dir=output_dir,
             overwrite_output_dir=True,
             num_train_epochs=3,
+            # A streamed dataset has no length to derive the number of steps from
+            max_steps=TRAINING_MAX_STEPS if isinstance(train_dataset, IterableDataset) else -1,
+            dataloader_num_workers=DATALOADER_NUM_WORKERS,
             per_device_train_batch_size=BATCH_SIZE,
             per_device_eval_batch_size=BATCH_SIZE,
             learning_rate=LEARNING_RATE,
@@ -101,6 +67,7 @@ class CodeModelTrainer:
             args=training_args,
             train_dataset=train_dataset,
             eval_dataset=val_dataset,
+            data_collator=DynamicPaddingCollator(self.tokenizer.pad_token_id),
         )
         
         trainer.train()